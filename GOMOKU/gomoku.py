@@ -1,12 +1,22 @@
 ### general data
 # import packages
+import array
 import collections
 import math
+import multiprocessing
+import os
 import random
+import time
 
 import pisqpipe as pp
 from pisqpipe import DEBUG_EVAL, DEBUG
 
+# optional packages
+try:
+    import numpy    # vectorized UCT in Array_MCTS, vectorized board evaluation in Old_Evaluator and batched move scoring in Evaluator
+except ImportError:
+    numpy = None
+
 # project version
 pp.infotext = 'name="pbrain-16307110232", author="Deng Qisheng", version="5.0", country="China", www="https://github.com/DengQisheng"'
 
@@ -14,16 +24,39 @@ pp.infotext = 'name="pbrain-16307110232", author="Deng Qisheng", version="5.0",
 MAX_BOARD = 20
 board = [[0 for y in range(MAX_BOARD)] for x in range(MAX_BOARD)]    # (x, y): (row, column)
 
+# cache file of the pattern table in Evaluator, rebuilt if its header doesn't match
+PATTERN_TABLE_FILE = 'pattern_table.bin'
+PATTERN_TABLE_VERSION = 1    # version of the file format and the rules of Evaluator.calc_pattern_value(): change it with them
+
+# searcher kept between turns (the MCTS tree is reused), None until the first turn
+searcher = None
+
 
 ### evaluators
 class Evaluator():
 
+    # pattern table shared by all evaluators: pattern code -> evaluation value and special shapes in one direction
+    PATTERN_VALUES = None
+    PATTERN_SHAPES = None
+
+    # constant data of self.search_forced_moves_batched() shared by all evaluators: {padded width: (offsets, shifts, factors)}
+    BATCH_DATA = {}
+
     def __init__(self):
         
         # the size of board
         self.HEIGHT = pp.height
         self.WIDTH = pp.width
 
+        # bitboard of the current board, None if the board is a 2-dimension list
+        self.bitboard = None
+
+        # incremental candidate moves of the current board, None if not maintained
+        self.candidates = None
+
+        # kinds of positions on the padded board for the pattern table, None if not available
+        self.states = None
+
     # functions for self.is_terminal()
     def check_horz_win(self, turn: int) -> bool:
 
@@ -117,7 +150,7 @@ class Evaluator():
             for x in range(5, y + 1):
                 
                 # traverse the pattern in given right diagonal
-                right_diag.pop(0); right_diag.append(self.grid[x][x - y])
+                right_diag.pop(0); right_diag.append(self.grid[x][y - x])
                 if self.is_win_pattern(turn, right_diag): return True
 
         # traverse all right diagonal patterns in lower-right half of the current board
@@ -160,14 +193,86 @@ class Evaluator():
                 if self.grid[x][y] == 0: return False    # still have a next move
         return True    # full of pieces
 
-    def is_terminal(self, grid: list, turn: int) -> int:
+    def is_win_move(self, move: tuple) -> bool:
+
+        '''
+        Check whether the piece on position move = (x, y) is in a win pattern (only four lines through the move).
+        '''
+        x, y = move
+        turn = self.grid[x][y]    # the player who placed the last piece
+
+        # count continuous pieces in four directions: horizontal, vertical, left diagonal, right diagonal
+        for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            i, j = x + dx, y + dy
+            while 0 <= i < self.HEIGHT and 0 <= j < self.WIDTH and self.grid[i][j] == turn:
+                count += 1; i += dx; j += dy
+            i, j = x - dx, y - dy
+            while 0 <= i < self.HEIGHT and 0 <= j < self.WIDTH and self.grid[i][j] == turn:
+                count += 1; i -= dx; j -= dy
+            if count >= 5: return True    # same as a [turn] * 5 pattern in the full scan
+
+        return False
+
+    def get_threat_moves(self, grid: list, move: tuple, turn: int, pieces: int = 4) -> list:
+
+        '''
+        Return free positions of the windows of five through move = (x, y) with the given pieces of turn and no other piece.
+        With pieces = 4, they are the positions completing five for turn (the four is through the move).
+        '''
+        x, y = move
+        threat_moves = []
+        for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+
+            # kinds of positions on the line within four of the move: -1 for the outside of the board
+            line = [
+                grid[x + k * dx][y + k * dy] if 0 <= x + k * dx < self.HEIGHT and 0 <= y + k * dy < self.WIDTH else -1
+                for k in range(-4, 5)
+            ]
+
+            # a window of five with the given pieces of turn and free positions only
+            for start in range(5):
+                window = line[start:start + 5]
+                if window.count(turn) == pieces and window.count(0) == 5 - pieces:
+                    for k in range(start - 4, start + 1):
+                        if line[k + 4] == 0 and (x + k * dx, y + k * dy) not in threat_moves: threat_moves.append((x + k * dx, y + k * dy))
+
+        return threat_moves
+
+    def count_pieces(self, grid: list) -> int:
+
+        '''
+        Return the number of pieces on the given grid.
+        '''
+        return sum(1 for x in range(self.HEIGHT) for y in range(self.WIDTH) if grid[x][y] != 0)
+
+    def is_terminal(self, grid: list, turn: int, move: tuple = None, pieces: int = None) -> int:
         
         '''
-        Check whether the board is in the WIN (1) or DRAW (-1) state.
+        Check whether the board is in the WIN (1) or DRAW (-1) state: WIN if the player who moved last (3 - turn) has five.
+        With the last move given, only the lines through the move are checked and the DRAW state comes from the number of pieces.
+        The grid can also be an instance of class BitBoard, which is checked by bitwise operations.
         '''
+
+        # bitboard: shift-and-AND checks on the bitsets, only the lines through the last move if given
+        if isinstance(grid, BitBoard):
+            if pieces is None: pieces = grid.count_pieces()
+            if grid.is_win(3 - turn) if move is None else grid.is_win_move(move): return 1    # the board is in the WIN state
+            elif pieces == self.HEIGHT * self.WIDTH: return -1    # the board is in the DRAW state
+            else: return 0    # the board is not the terminal
+
         self.grid = grid    # update the current grid
-        if self.is_win(turn): return 1    # the board is in the WIN state
-        elif self.is_draw(): return -1    # the board is in the DRAW state
+
+        # full scan: check whether the player who moved last has a win pattern
+        if move is None:
+            if self.is_win(3 - turn): return 1    # the board is in the WIN state
+            elif self.is_draw(): return -1    # the board is in the DRAW state
+            else: return 0    # the board is not the terminal
+
+        # last-move check: check whether the player who placed the last piece has a win pattern
+        if pieces is None: pieces = self.count_pieces(grid)
+        if self.is_win_move(move): return 1    # the board is in the WIN state
+        elif pieces == self.HEIGHT * self.WIDTH: return -1    # the board is in the DRAW state
         else: return 0    # the board is not the terminal
 
     # functions for self.get_next_moves()
@@ -281,6 +386,451 @@ class Evaluator():
 
         return l1_v, l2_v, l3_v, l4_v, l5_v, r1_v, r2_v, r3_v, r4_v, r5_v
 
+    def calc_pattern_value(self, pattern: tuple, AI: int, OPP: int) -> tuple:
+
+        '''
+        Return the evaluation value and special shapes of the pattern (l1, ..., l5, r1, ..., r5) in one direction.
+        '''
+
+        # initialize basic data
+        value = 0    # heuristic value
+        ILLEGAL, NULL = -1, 0    # value -1: illegal, value 0: null
+        l1, l2, l3, l4, l5, r1, r2, r3, r4, r5 = pattern
+
+        # special shapes
+        four_win_shape = 0    # double-four win
+        four_lost_shape = 0    # double-four lost
+        three_win_shape = 0    # double-three win
+        three_lost_shape = 0    # double-three lost
+
+
+        # the threat level of patterns
+        threat = 1
+
+        # 5-in-line (shape of 4)
+        if threat <= 5:
+
+            # 5-in-line to win (shape of 4)
+            if l4 == l3 == l2 == l1 == AI: value += 750000000; threat = 5
+            if l3 == l2 == l1 == r1 == AI: value += 750000000; threat = 5
+            if l2 == l1 == r1 == r2 == AI: value += 750000000; threat = 5
+            if l1 == r1 == r2 == r3 == AI: value += 750000000; threat = 5
+            if r1 == r2 == r3 == r4 == AI: value += 750000000; threat = 5
+
+            # 5-in-line to block (shape of 4)
+            if l4 == l3 == l2 == l1 == OPP: value += 150000000; threat = 5
+            if l3 == l2 == l1 == r1 == OPP: value += 150000000; threat = 5
+            if l2 == l1 == r1 == r2 == OPP: value += 150000000; threat = 5
+            if l1 == r1 == r2 == r3 == OPP: value += 150000000; threat = 5
+            if r1 == r2 == r3 == r4 == OPP: value += 150000000; threat = 5
+
+        # 4-in-line (shape of 3)
+        if threat <= 4:
+
+            # 4-in-line to win (shape of 3)
+            if l3 == l2 == l1 == AI:
+                if l4 == NULL and r1 == NULL: value += 5000000; four_win_shape += 1; threat = 4
+                elif l4 == OPP and r1 == NULL: value += 300
+                elif l4 == ILLEGAL and r1 == NULL: value += 250
+                elif l4 == NULL and r1 == OPP: value += 100
+                elif l4 == NULL and r1 == ILLEGAL: value += 80
+                elif l4 == OPP and r1 == OPP: value += -100
+                elif l4 == ILLEGAL and r1 == OPP: value += -200
+                elif l4 == OPP and r1 == ILLEGAL: value += -300
+            if l2 == l1 == r1 == AI:
+                if l3 == NULL and r2 == NULL: value += 2500000; four_win_shape += 1; threat = 4
+                elif l3 == OPP and r2 == NULL: value += 250
+                elif l3 == ILLEGAL and r2 == NULL: value += 200
+                elif l3 == NULL and r2 == OPP: value += 150
+                elif l3 == NULL and r2 == ILLEGAL: value += 100
+                elif l3 == OPP and r2 == OPP: value += -100
+                elif l3 == ILLEGAL and r2 == OPP: value += -200
+                elif l3 == OPP and r2 == ILLEGAL: value += -300
+            if l1 == r1 == r2 == AI:
+                if r3 == NULL and l2 == NULL: value += 2500000; four_win_shape += 1; threat = 4
+                elif r3 == OPP and l2 == NULL: value += 250
+                elif r3 == ILLEGAL and l2 == NULL: value += 200
+                elif r3 == NULL and l2 == OPP: value += 150
+                elif r3 == NULL and l2 == ILLEGAL: value += 100
+                elif r3 == OPP and l2 == OPP: value += -100
+                elif r3 == ILLEGAL and l2 == OPP: value += -200
+                elif r3 == OPP and l2 == ILLEGAL: value += -300
+            if r1 == r2 == r3 == AI:
+                if r4 == NULL and l1 == NULL: value += 5000000; four_win_shape += 1; threat = 4
+                elif r4 == OPP and l1 == NULL: value += 300
+                elif r4 == ILLEGAL and l1 == NULL: value += 250
+                elif r4 == NULL and l1 == OPP: value += 100
+                elif r4 == NULL and l1 == ILLEGAL: value += 80
+                elif r4 == OPP and l1 == OPP: value += -100
+                elif r4 == ILLEGAL and l1 == OPP: value += -200
+                elif r4 == OPP and l1 == ILLEGAL: value += -300
+            if l4 == l2 == l1 == AI and l3 == NULL: 
+                if l5 == NULL: value += 25000; four_win_shape += 1; threat = 4
+                elif l5 == OPP: value += 400
+                elif l5 == ILLEGAL: value += 300
+            if l4 == l3 == l1 == AI and l2 == NULL: 
+                if l5 == NULL: value += 20000; four_win_shape += 1; threat = 4
+                elif l5 == OPP: value += 350
+                elif l5 == ILLEGAL: value += 250
+            if l4 == l3 == l2 == AI and l1 == NULL: 
+                if l5 == NULL: value += 10000; four_win_shape += 1; threat = 4
+                elif l5 == OPP: value += 450
+                elif l5 == ILLEGAL: value += 350
+            if r2 == r3 == r4 == AI and r1 == NULL: 
+                if r5 == NULL: value += 10000; four_win_shape += 1; threat = 4
+                elif r5 == OPP: value += 450
+                elif r5 == ILLEGAL: value += 350
+            if r1 == r3 == r4 == AI and r2 == NULL: 
+                if r5 == NULL: value += 20000; four_win_shape += 1; threat = 4
+                elif r5 == OPP: value += 350
+                elif r5 == ILLEGAL: value += 250
+            if r1 == r2 == r4 == AI and r3 == NULL:
+                if r5 == NULL: value += 25000; four_win_shape += 1; threat = 4
+                elif r5 == OPP: value += 400
+                elif r5 == ILLEGAL: value += 300
+
+            # 4-in-line to block (shape of 3)
+            if l3 == l2 == l1 == OPP:
+                if l4 == NULL and r1 == NULL: value += 1000000; four_lost_shape += 1; threat = 4
+                elif l4 == AI and r1 == NULL: value += 300
+                elif l4 == ILLEGAL and r1 == NULL: value += 250
+                elif l4 == NULL and r1 == AI: value += 100
+                elif l4 == NULL and r1 == ILLEGAL: value += 80
+                elif l4 == AI and r1 == AI: value += -100
+                elif l4 == ILLEGAL and r1 == AI: value += -200
+                elif l4 == AI and r1 == ILLEGAL: value += -300
+            if l2 == l1 == r1 == OPP:
+                if l3 == NULL and r2 == NULL: value += 2000000; four_lost_shape += 1; threat = 4
+                elif l3 == AI and r2 == NULL: value += 250
+                elif l3 == ILLEGAL and r2 == NULL: value += 200
+                elif l3 == NULL and r2 == AI: value += 150
+                elif l3 == NULL and r2 == ILLEGAL: value += 100
+                elif l3 == AI and r2 == AI: value += -100
+                elif l3 == ILLEGAL and r2 == AI: value += -200
+                elif l3 == AI and r2 == ILLEGAL: value += -300
+            if l1 == r1 == r2 == OPP:
+                if r3 == NULL and l2 == NULL: value += 2000000; four_lost_shape += 1; threat = 4
+                elif r3 == AI and l2 == NULL: value += 250
+                elif r3 == ILLEGAL and l2 == NULL: value += 200
+                elif r3 == NULL and l2 == AI: value += 150
+                elif r3 == NULL and l2 == ILLEGAL: value += 100
+                elif r3 == AI and l2 == AI: value += -100
+                elif r3 == ILLEGAL and l2 == AI: value += -200
+                elif r3 == AI and l2 == ILLEGAL: value += -300
+            if r1 == r2 == r3 == OPP:
+                if r4 == NULL and l1 == NULL: value += 1000000; four_lost_shape += 1; threat = 4
+                elif r4 == AI and l1 == NULL: value += 300
+                elif r4 == ILLEGAL and l1 == NULL: value += 250
+                elif r4 == NULL and l1 == AI: value += 100
+                elif r4 == NULL and l1 == ILLEGAL: value += 80
+                elif r4 == AI and l1 == AI: value += -100
+                elif r4 == ILLEGAL and l1 == AI: value += -200
+                elif r4 == AI and l1 == ILLEGAL: value += -300
+            if l4 == l2 == l1 == OPP and l3 == NULL: 
+                if l5 == NULL: value += 10000; four_lost_shape += 1; threat = 4
+                elif l5 == AI: value += 400
+                elif l5 == ILLEGAL: value += 300
+            if l4 == l3 == l1 == OPP and l2 == NULL: 
+                if l5 == NULL: value += 8000; four_lost_shape += 1; threat = 4
+                elif l5 == AI: value += 350
+                elif l5 == ILLEGAL: value += 250
+            if l4 == l3 == l2 == OPP and l1 == NULL: 
+                if l5 == NULL: value += 4000; four_lost_shape += 1; threat = 4
+                elif l5 == AI: value += 450
+                elif l5 == ILLEGAL: value += 350
+            if r2 == r3 == r4 == OPP and r1 == NULL: 
+                if l5 == NULL: value += 4000; four_lost_shape += 1; threat = 4
+                elif l5 == AI: value += 450
+                elif l5 == ILLEGAL: value += 350
+            if r1 == r3 == r4 == OPP and r2 == NULL: 
+                if l5 == NULL: value += 8000; four_lost_shape += 1; threat = 4
+                elif l5 == AI: value += 350
+                elif l5 == ILLEGAL: value += 250
+            if r1 == r2 == r4 == OPP and r3 == NULL:
+                if r5 == NULL: value += 10000; four_lost_shape += 1; threat = 4
+                elif r5 == AI: value += 400
+                elif r5 == ILLEGAL: value += 300
+
+        # 3-in-line (shape of 2)
+        if threat <= 3:
+
+            # 3-in-line to attack (shape of 2)
+            if l3 == l2 == AI and l1 == NULL:
+                if l4 == NULL and r1 == NULL: value += 1000; three_win_shape += 1; threat = 3
+                elif l4 == OPP and r1 == NULL: value += 50
+                elif l4 == NULL and r1 == OPP: value += 45
+                elif l4 == NULL and r1 == ILLEGAL: value += 40
+                elif l4 == ILLEGAL and r1 == NULL: value += 30
+                elif l4 == OPP and r1 == OPP: value += -20
+                elif l4 == OPP and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == OPP: value += -30
+            if l3 == l1 == AI and l2 == NULL:
+                if l4 == NULL and r1 == NULL: value += 1500; three_win_shape += 1; threat = 3
+                elif l4 == OPP and r1 == NULL: value += 80
+                elif l4 == NULL and r1 == OPP: value += 65
+                elif l4 == ILLEGAL and r1 == NULL: value += 50
+                elif l4 == NULL and r1 == ILLEGAL: value += 40
+                elif l4 == OPP and r1 == OPP: value += -20
+                elif l4 == OPP and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == OPP: value += -30
+            if l2 == l1 == AI and l3 == NULL:
+                if l4 == NULL and r1 == NULL: value += 3000; three_win_shape += 1; threat = 3
+                elif l4 == OPP and r1 == NULL: value += 1000
+                elif l4 == ILLEGAL and r1 == NULL: value += 500
+                elif l4 == NULL and r1 == OPP: value += 60
+                elif l4 == NULL and r1 == ILLEGAL: value += 50
+                elif l4 == OPP and r1 == OPP: value += -20
+                elif l4 == OPP and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == OPP: value += -30
+            if l2 == r1 == AI and l1 == NULL:
+                if l3 == NULL and r2 == NULL: value += 1500; three_win_shape += 1; threat = 3
+                elif l3 == OPP and r2 == NULL: value += 80
+                elif l3 == NULL and r2 == OPP: value += 65
+                elif l3 == ILLEGAL and r2 == NULL: value += 50
+                elif l3 == NULL and r2 == ILLEGAL: value += 40
+                elif l3 == OPP and r2 == OPP: value += -20
+                elif l3 == OPP and r2 == ILLEGAL: value += -25
+                elif l3 == ILLEGAL and r2 == OPP: value += -30
+            if l1 == r1 == AI:
+                if l2 == NULL and r2 == NULL: value += 2000; three_win_shape += 1; threat = 3
+                elif l2 == OPP and r2 == NULL: value += 60
+                elif l2 == NULL and r2 == OPP: value += 60
+                elif l2 == ILLEGAL and r2 == NULL: value += 50
+                elif l2 == NULL and r2 == ILLEGAL: value += 50
+                elif l2 == OPP and r2 == OPP: value += -20
+                elif l2 == OPP and r2 == ILLEGAL: value += -25
+                elif l2 == ILLEGAL and r2 == OPP: value += -30
+            if l2 == r2 == AI:
+                if l1 == NULL and r1 == NULL: value += 800; three_win_shape += 1; threat = 3
+                elif l1 == OPP and r1 == NULL: value += 20
+                elif l1 == NULL and r1 == OPP: value += 20
+                elif l1 == OPP and r1 == OPP: value += -10
+            if r2 == l1 == AI and l1 == NULL:
+                if r3 == NULL and l2 == NULL: value += 1500; three_win_shape += 1; threat = 3
+                elif r3 == OPP and l2 == NULL: value += 80
+                elif r3 == NULL and l2 == OPP: value += 65
+                elif r3 == ILLEGAL and l2 == NULL: value += 50
+                elif r3 == NULL and l2 == ILLEGAL: value += 40
+                elif r3 == OPP and l2 == OPP: value += -20
+                elif r3 == OPP and l2 == ILLEGAL: value += -25
+                elif r3 == ILLEGAL and l2 == OPP: value += -30
+            if r2 == r1 == AI and r3 == NULL:
+                if r4 == NULL and l1 == NULL: value += 3000; three_win_shape += 1; threat = 3
+                elif r4 == OPP and l1 == NULL: value += 1000
+                elif r4 == ILLEGAL and l1 == NULL: value += 500
+                elif r4 == NULL and l1 == OPP: value += 60
+                elif r4 == NULL and l1 == ILLEGAL: value += 50
+                elif r4 == OPP and l1 == OPP: value += -20
+                elif r4 == OPP and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == OPP: value += -30
+            if r3 == r1 == AI and r2 == NULL:
+                if r4 == NULL and l1 == NULL: value += 1500; three_win_shape += 1; threat = 3
+                elif r4 == OPP and l1 == NULL: value += 80
+                elif r4 == NULL and l1 == OPP: value += 65
+                elif r4 == ILLEGAL and l1 == NULL: value += 50
+                elif r4 == NULL and l1 == ILLEGAL: value += 40
+                elif r4 == OPP and l1 == OPP: value += -20
+                elif r4 == OPP and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == OPP: value += -30
+            if r3 == r2 == AI and r1 == NULL:
+                if r4 == NULL and l1 == NULL: value += 1000; three_win_shape += 1; threat = 3
+                elif r4 == OPP and l1 == NULL: value += 50
+                elif r4 == NULL and l1 == OPP: value += 45
+                elif r4 == NULL and l1 == ILLEGAL: value += 40
+                elif r4 == ILLEGAL and l1 == NULL: value += 30
+                elif r4 == OPP and l1 == OPP: value += -20
+                elif r4 == OPP and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == OPP: value += -30
+
+            # 3-in-line to defend (shape of 2)
+            if l3 == l2 == OPP and l1 == NULL:
+                if l4 == NULL and r1 == NULL: value += 800; three_lost_shape += 1; threat = 3
+                elif l4 == AI and r1 == NULL: value += 30
+                elif l4 == NULL and r1 == AI: value += 25
+                elif l4 == NULL and r1 == ILLEGAL: value += 20
+                elif l4 == ILLEGAL and r1 == NULL: value += 15
+                elif l4 == AI and r1 == AI: value += -20
+                elif l4 == AI and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == AI: value += -30
+            if l3 == l1 == OPP and l2 == NULL:
+                if l4 == NULL and r1 == NULL: value += 1200; three_lost_shape += 1; threat = 3
+                elif l4 == AI and r1 == NULL: value += 50
+                elif l4 == NULL and r1 == AI: value += 45
+                elif l4 == ILLEGAL and r1 == NULL: value += 40
+                elif l4 == NULL and r1 == ILLEGAL: value += 30
+                elif l4 == AI and r1 == AI: value += -20
+                elif l4 == AI and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == AI: value += -30
+            if l2 == l1 == OPP and l3 == NULL:
+                if l4 == NULL and r1 == NULL: value += 2400; three_lost_shape += 1; threat = 3
+                elif l4 == AI and r1 == NULL: value += 800
+                elif l4 == ILLEGAL and r1 == NULL: value += 400
+                elif l4 == NULL and r1 == AI: value += 40
+                elif l4 == NULL and r1 == ILLEGAL: value += 30
+                elif l4 == AI and r1 == AI: value += -20
+                elif l4 == AI and r1 == ILLEGAL: value += -25
+                elif l4 == ILLEGAL and r1 == AI: value += -30
+            if l2 == r1 == OPP and l1 == NULL:
+                if l3 == NULL and r2 == NULL: value += 1200; three_lost_shape += 1; threat = 3
+                elif l3 == AI and r2 == NULL: value += 50
+                elif l3 == NULL and r2 == AI: value += 45
+                elif l3 == ILLEGAL and r2 == NULL: value += 40
+                elif l3 == NULL and r2 == ILLEGAL: value += 30
+                elif l3 == AI and r2 == AI: value += -20
+                elif l3 == AI and r2 == ILLEGAL: value += -25
+                elif l3 == ILLEGAL and r2 == AI: value += -30
+            if l1 == r1 == OPP:
+                if l2 == NULL and r2 == NULL: value += 1600; three_lost_shape += 1; threat = 3
+                elif l2 == AI and r2 == NULL: value += 40
+                elif l2 == NULL and r2 == AI: value += 40
+                elif l2 == ILLEGAL and r2 == NULL: value += 30
+                elif l2 == NULL and r2 == ILLEGAL: value += 30
+                elif l2 == AI and r2 == AI: value += -20
+                elif l2 == AI and r2 == ILLEGAL: value += -25
+                elif l2 == ILLEGAL and r2 == AI: value += -30
+            if l2 == r2 == OPP:
+                if l1 == NULL and r1 == NULL: value += 640; three_lost_shape += 1; threat = 3
+                elif l1 == AI and r1 == NULL: value += 15
+                elif l1 == NULL and r1 == AI: value += 15
+                elif l1 == AI and r1 == AI: value += -10
+            if r2 == l1 == OPP and r1 == NULL:
+                if r3 == NULL and l2 == NULL: value += 1200; three_win_shape += 1; threat = 3
+                elif r3 == AI and l2 == NULL: value += 50
+                elif r3 == NULL and l2 == AI: value += 45
+                elif r3 == ILLEGAL and l2 == NULL: value += 40
+                elif r3 == NULL and l2 == ILLEGAL: value += 30
+                elif r3 == AI and l2 == AI: value += -20
+                elif r3 == AI and l2 == ILLEGAL: value += -25
+                elif r3 == ILLEGAL and l2 == AI: value += -30
+            if r2 == r1 == OPP and r3 == NULL:
+                if r4 == NULL and l1 == NULL: value += 2400; three_win_shape += 1; threat = 3
+                elif r4 == AI and l1 == NULL: value += 800
+                elif r4 == ILLEGAL and l1 == NULL: value += 400
+                elif r4 == NULL and l1 == AI: value += 40
+                elif r4 == NULL and l1 == ILLEGAL: value += 30
+                elif r4 == AI and l1 == AI: value += -20
+                elif r4 == AI and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == AI: value += -30
+            if r3 == r1 == OPP and r2 == NULL:
+                if r4 == NULL and l1 == NULL: value += 1200; three_lost_shape += 1; threat = 3
+                elif r4 == AI and l1 == NULL: value += 50
+                elif r4 == NULL and l1 == AI: value += 45
+                elif r4 == ILLEGAL and l1 == NULL: value += 40
+                elif r4 == NULL and l1 == ILLEGAL: value += 30
+                elif r4 == AI and l1 == AI: value += -20
+                elif r4 == AI and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == AI: value += -30
+            if r3 == r2 == OPP and r1 == NULL:
+                if r4 == NULL and l1 == NULL: value += 800; three_lost_shape += 1; threat = 3
+                elif r4 == AI and l1 == NULL: value += 30
+                elif r4 == NULL and l1 == AI: value += 25
+                elif r4 == NULL and l1 == ILLEGAL: value += 20
+                elif r4 == ILLEGAL and l1 == NULL: value += 15
+                elif r4 == AI and l1 == AI: value += -20
+                elif r4 == AI and l1 == ILLEGAL: value += -25
+                elif r4 == ILLEGAL and l1 == AI: value += -30
+
+        # 2-in-position (shape of 1)
+        if threat <= 2:
+            if l3 == AI: value += 2
+            if l2 == AI: value += 6
+            if l1 == AI: value += 10
+            if r1 == AI: value += 10
+            if r2 == AI: value += 6
+            if r3 == AI: value += 2
+            if l3 == OPP: value += 1
+            if l2 == OPP: value += 3
+            if l1 == OPP: value += 5
+            if r1 == OPP: value += 5
+            if r2 == OPP: value += 3
+            if r3 == OPP: value += 1
+
+        return value, four_win_shape, four_lost_shape, three_win_shape, three_lost_shape
+
+    # functions for the pattern table
+    def get_pattern_codes(self) -> list:
+
+        '''
+        Return all reachable pattern codes: on each side, positions after the edge of the board are all illegal.
+        '''
+
+        # codes of one side: 5 positions with kinds 0: illegal, 1: null, 2: AI, 3: opponent, weight 4 ** i for the i-th position
+        side_codes = [0]
+        for length in range(1, 6):
+            side_codes.extend(
+                sum(((code // 3 ** i) % 3 + 1) * 4 ** i for i in range(length)) for code in range(3 ** length)
+            )
+
+        # codes of both sides: (l1, ..., l5) in lower bits, (r1, ..., r5) in higher bits
+        return [left + (right << 10) for right in side_codes for left in side_codes]
+
+    def build_pattern_table(self, codes: list) -> tuple:
+
+        '''
+        Return the evaluation values and special shapes of the given pattern codes.
+        '''
+        values, shapes = array.array('q'), array.array('L')
+        kinds = (-1, 0, 1, 2)    # code kind -> position value with AI = 1, opponent = 2
+        for code in codes:
+            pattern = tuple(kinds[(code >> 2 * i) & 3] for i in range(10))
+            value, four_win, four_lost, three_win, three_lost = self.calc_pattern_value(pattern, 1, 2)
+            values.append(value)
+            shapes.append(four_win | four_lost << 8 | three_win << 16 | three_lost << 24)    # 8 bits for each shape
+        return values, shapes
+
+    def load_pattern_table(self):
+
+        '''
+        Load the pattern table from the cache file, or build it and save the cache file.
+        '''
+        if Evaluator.PATTERN_VALUES is not None: return
+
+        # read the cache file of reachable codes
+        codes = self.get_pattern_codes()
+        path = os.path.join(pp.dataFolder or os.path.dirname(os.path.abspath(__file__)), PATTERN_TABLE_FILE)
+        values, shapes = array.array('q'), array.array('L')
+
+        # header: version, item sizes (the size of 'L' depends on the platform) and the number of codes
+        header = array.array('q', [PATTERN_TABLE_VERSION, values.itemsize, shapes.itemsize, len(codes)])
+        try:
+            with open(path, 'rb') as f:
+                file_header = array.array('q')
+                file_header.fromfile(f, len(header))
+                if file_header != header: raise ValueError('outdated pattern table')
+                values.fromfile(f, len(codes))
+                shapes.fromfile(f, len(codes))
+        except (OSError, EOFError, ValueError):
+            values, shapes = self.build_pattern_table(codes)
+            try:
+                with open(path, 'wb') as f:
+                    header.tofile(f)
+                    values.tofile(f)
+                    shapes.tofile(f)
+            except OSError:
+                pass    # the table still works without the cache file
+
+        # scatter into tables indexed by code
+        Evaluator.PATTERN_VALUES = array.array('q', bytes(8 * 4 ** 10))
+        Evaluator.PATTERN_SHAPES = array.array('L', bytes(array.array('L').itemsize * 4 ** 10))
+        for code, value, shape in zip(codes, values, shapes):
+            Evaluator.PATTERN_VALUES[code] = value
+            Evaluator.PATTERN_SHAPES[code] = shape
+
+    def set_pattern_states(self):
+
+        '''
+        Store the kinds of all positions (0: illegal, 1: null, 2: AI, 3: opponent) on a board padded by five illegal positions.
+        No states are stored for boards with blocks, which fall back to the patterns in self.calc_pattern_value().
+        '''
+        self.load_pattern_table()
+        self.PADDED_WIDTH = self.WIDTH + 10
+        kinds = {0: 1, self.turn: 2, 3 - self.turn: 3}    # position value -> code kind
+        self.states = [0] * ((self.HEIGHT + 10) * self.PADDED_WIDTH)
+        for x in range(self.HEIGHT):
+            for y in range(self.WIDTH):
+                if self.grid[x][y] not in kinds: self.states = None; return    # blocked position
+                self.states[(x + 5) * self.PADDED_WIDTH + y + 5] = kinds[self.grid[x][y]]
+
     def search_forced_moves(self, move: tuple):
 
         '''
@@ -289,7 +839,7 @@ class Evaluator():
 
         # initialize basic data
         value = 0    # heuristic value
-        ILLEGAL, NULL, AI, OPP = -1, 0, self.turn, 3 - self.turn    # value -1: illegal, value 0: null, value 1: myself, value 2: opponent
+        AI, OPP = self.turn, 3 - self.turn    # value 1: myself, value 2: opponent
         x, y = move[0], move[1]    # move: (x, y)
 
         # special shapes
@@ -297,358 +847,35 @@ class Evaluator():
         four_lost_shape = 0    # double-four lost
         three_win_shape = 0    # double-three win
         three_lost_shape = 0    # double-three lost
-        
-        # get pattern data
-        pattern_data = [
-            self.get_horz_pattern(x, y),
-            self.get_vert_pattern(x, y),
-            self.get_left_diag_pattern(x, y),
-            self.get_right_diag_pattern(x, y)
-        ]
 
-        # search in four directions
-        for l1, l2, l3, l4, l5, r1, r2, r3, r4, r5 in pattern_data:
-
-            # the threat level of patterns
-            threat = 1
-
-            # 5-in-line (shape of 4)
-            if threat <= 5:
-
-                # 5-in-line to win (shape of 4)
-                if l4 == l3 == l2 == l1 == AI: value += 750000000; threat = 5
-                if l3 == l2 == l1 == r1 == AI: value += 750000000; threat = 5
-                if l2 == l1 == r1 == r2 == AI: value += 750000000; threat = 5
-                if l1 == r1 == r2 == r3 == AI: value += 750000000; threat = 5
-                if r1 == r2 == r3 == r4 == AI: value += 750000000; threat = 5
-
-                # 5-in-line to block (shape of 4)
-                if l4 == l3 == l2 == l1 == OPP: value += 150000000; threat = 5
-                if l3 == l2 == l1 == r1 == OPP: value += 150000000; threat = 5
-                if l2 == l1 == r1 == r2 == OPP: value += 150000000; threat = 5
-                if l1 == r1 == r2 == r3 == OPP: value += 150000000; threat = 5
-                if r1 == r2 == r3 == r4 == OPP: value += 150000000; threat = 5
-
-            # 4-in-line (shape of 3)
-            if threat <= 4:
-
-                # 4-in-line to win (shape of 3)
-                if l3 == l2 == l1 == AI:
-                    if l4 == NULL and r1 == NULL: value += 5000000; four_win_shape += 1; threat = 4
-                    elif l4 == OPP and r1 == NULL: value += 300
-                    elif l4 == ILLEGAL and r1 == NULL: value += 250
-                    elif l4 == NULL and r1 == OPP: value += 100
-                    elif l4 == NULL and r1 == ILLEGAL: value += 80
-                    elif l4 == OPP and r1 == OPP: value += -100
-                    elif l4 == ILLEGAL and r1 == OPP: value += -200
-                    elif l4 == OPP and r1 == ILLEGAL: value += -300
-                if l2 == l1 == r1 == AI:
-                    if l3 == NULL and r2 == NULL: value += 2500000; four_win_shape += 1; threat = 4
-                    elif l3 == OPP and r2 == NULL: value += 250
-                    elif l3 == ILLEGAL and r2 == NULL: value += 200
-                    elif l3 == NULL and r2 == OPP: value += 150
-                    elif l3 == NULL and r2 == ILLEGAL: value += 100
-                    elif l3 == OPP and r2 == OPP: value += -100
-                    elif l3 == ILLEGAL and r2 == OPP: value += -200
-                    elif l3 == OPP and r2 == ILLEGAL: value += -300
-                if l1 == r1 == r2 == AI:
-                    if r3 == NULL and l2 == NULL: value += 2500000; four_win_shape += 1; threat = 4
-                    elif r3 == OPP and l2 == NULL: value += 250
-                    elif r3 == ILLEGAL and l2 == NULL: value += 200
-                    elif r3 == NULL and l2 == OPP: value += 150
-                    elif r3 == NULL and l2 == ILLEGAL: value += 100
-                    elif r3 == OPP and l2 == OPP: value += -100
-                    elif r3 == ILLEGAL and l2 == OPP: value += -200
-                    elif r3 == OPP and l2 == ILLEGAL: value += -300
-                if r1 == r2 == r3 == AI:
-                    if r4 == NULL and l1 == NULL: value += 5000000; four_win_shape += 1; threat = 4
-                    elif r4 == OPP and l1 == NULL: value += 300
-                    elif r4 == ILLEGAL and l1 == NULL: value += 250
-                    elif r4 == NULL and l1 == OPP: value += 100
-                    elif r4 == NULL and l1 == ILLEGAL: value += 80
-                    elif r4 == OPP and l1 == OPP: value += -100
-                    elif r4 == ILLEGAL and l1 == OPP: value += -200
-                    elif r4 == OPP and l1 == ILLEGAL: value += -300
-                if l4 == l2 == l1 == AI and l3 == NULL: 
-                    if l5 == NULL: value += 25000; four_win_shape += 1; threat = 4
-                    elif l5 == OPP: value += 400
-                    elif l5 == ILLEGAL: value += 300
-                if l4 == l3 == l1 == AI and l2 == NULL: 
-                    if l5 == NULL: value += 20000; four_win_shape += 1; threat = 4
-                    elif l5 == OPP: value += 350
-                    elif l5 == ILLEGAL: value += 250
-                if l4 == l3 == l2 == AI and l1 == NULL: 
-                    if l5 == NULL: value += 10000; four_win_shape += 1; threat = 4
-                    elif l5 == OPP: value += 450
-                    elif l5 == ILLEGAL: value += 350
-                if r2 == r3 == r4 == AI and r1 == NULL: 
-                    if r5 == NULL: value += 10000; four_win_shape += 1; threat = 4
-                    elif r5 == OPP: value += 450
-                    elif r5 == ILLEGAL: value += 350
-                if r1 == r3 == r4 == AI and r2 == NULL: 
-                    if r5 == NULL: value += 20000; four_win_shape += 1; threat = 4
-                    elif r5 == OPP: value += 350
-                    elif r5 == ILLEGAL: value += 250
-                if r1 == r2 == r4 == AI and r3 == NULL:
-                    if r5 == NULL: value += 25000; four_win_shape += 1; threat = 4
-                    elif r5 == OPP: value += 400
-                    elif r5 == ILLEGAL: value += 300
-
-                # 4-in-line to block (shape of 3)
-                if l3 == l2 == l1 == OPP:
-                    if l4 == NULL and r1 == NULL: value += 1000000; four_lost_shape += 1; threat = 4
-                    elif l4 == AI and r1 == NULL: value += 300
-                    elif l4 == ILLEGAL and r1 == NULL: value += 250
-                    elif l4 == NULL and r1 == AI: value += 100
-                    elif l4 == NULL and r1 == ILLEGAL: value += 80
-                    elif l4 == AI and r1 == AI: value += -100
-                    elif l4 == ILLEGAL and r1 == AI: value += -200
-                    elif l4 == AI and r1 == ILLEGAL: value += -300
-                if l2 == l1 == r1 == OPP:
-                    if l3 == NULL and r2 == NULL: value += 2000000; four_lost_shape += 1; threat = 4
-                    elif l3 == AI and r2 == NULL: value += 250
-                    elif l3 == ILLEGAL and r2 == NULL: value += 200
-                    elif l3 == NULL and r2 == AI: value += 150
-                    elif l3 == NULL and r2 == ILLEGAL: value += 100
-                    elif l3 == AI and r2 == AI: value += -100
-                    elif l3 == ILLEGAL and r2 == AI: value += -200
-                    elif l3 == AI and r2 == ILLEGAL: value += -300
-                if l1 == r1 == r2 == OPP:
-                    if r3 == NULL and l2 == NULL: value += 2000000; four_lost_shape += 1; threat = 4
-                    elif r3 == AI and l2 == NULL: value += 250
-                    elif r3 == ILLEGAL and l2 == NULL: value += 200
-                    elif r3 == NULL and l2 == AI: value += 150
-                    elif r3 == NULL and l2 == ILLEGAL: value += 100
-                    elif r3 == AI and l2 == AI: value += -100
-                    elif r3 == ILLEGAL and l2 == AI: value += -200
-                    elif r3 == AI and l2 == ILLEGAL: value += -300
-                if r1 == r2 == r3 == OPP:
-                    if r4 == NULL and l1 == NULL: value += 1000000; four_lost_shape += 1; threat = 4
-                    elif r4 == AI and l1 == NULL: value += 300
-                    elif r4 == ILLEGAL and l1 == NULL: value += 250
-                    elif r4 == NULL and l1 == AI: value += 100
-                    elif r4 == NULL and l1 == ILLEGAL: value += 80
-                    elif r4 == AI and l1 == AI: value += -100
-                    elif r4 == ILLEGAL and l1 == AI: value += -200
-                    elif r4 == AI and l1 == ILLEGAL: value += -300
-                if l4 == l2 == l1 == OPP and l3 == NULL: 
-                    if l5 == NULL: value += 10000; four_lost_shape += 1; threat = 4
-                    elif l5 == AI: value += 400
-                    elif l5 == ILLEGAL: value += 300
-                if l4 == l3 == l1 == OPP and l2 == NULL: 
-                    if l5 == NULL: value += 8000; four_lost_shape += 1; threat = 4
-                    elif l5 == AI: value += 350
-                    elif l5 == ILLEGAL: value += 250
-                if l4 == l3 == l2 == OPP and l1 == NULL: 
-                    if l5 == NULL: value += 4000; four_lost_shape += 1; threat = 4
-                    elif l5 == AI: value += 450
-                    elif l5 == ILLEGAL: value += 350
-                if r2 == r3 == r4 == OPP and r1 == NULL: 
-                    if l5 == NULL: value += 4000; four_lost_shape += 1; threat = 4
-                    elif l5 == AI: value += 450
-                    elif l5 == ILLEGAL: value += 350
-                if r1 == r3 == r4 == OPP and r2 == NULL: 
-                    if l5 == NULL: value += 8000; four_lost_shape += 1; threat = 4
-                    elif l5 == AI: value += 350
-                    elif l5 == ILLEGAL: value += 250
-                if r1 == r2 == r4 == OPP and r3 == NULL:
-                    if r5 == NULL: value += 10000; four_lost_shape += 1; threat = 4
-                    elif r5 == AI: value += 400
-                    elif r5 == ILLEGAL: value += 300
-
-            # 3-in-line (shape of 2)
-            if threat <= 3:
-
-                # 3-in-line to attack (shape of 2)
-                if l3 == l2 == AI and l1 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 1000; three_win_shape += 1; threat = 3
-                    elif l4 == OPP and r1 == NULL: value += 50
-                    elif l4 == NULL and r1 == OPP: value += 45
-                    elif l4 == NULL and r1 == ILLEGAL: value += 40
-                    elif l4 == ILLEGAL and r1 == NULL: value += 30
-                    elif l4 == OPP and r1 == OPP: value += -20
-                    elif l4 == OPP and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == OPP: value += -30
-                if l3 == l1 == AI and l2 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 1500; three_win_shape += 1; threat = 3
-                    elif l4 == OPP and r1 == NULL: value += 80
-                    elif l4 == NULL and r1 == OPP: value += 65
-                    elif l4 == ILLEGAL and r1 == NULL: value += 50
-                    elif l4 == NULL and r1 == ILLEGAL: value += 40
-                    elif l4 == OPP and r1 == OPP: value += -20
-                    elif l4 == OPP and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == OPP: value += -30
-                if l2 == l1 == AI and l3 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 3000; three_win_shape += 1; threat = 3
-                    elif l4 == OPP and r1 == NULL: value += 1000
-                    elif l4 == ILLEGAL and r1 == NULL: value += 500
-                    elif l4 == NULL and r1 == OPP: value += 60
-                    elif l4 == NULL and r1 == ILLEGAL: value += 50
-                    elif l4 == OPP and r1 == OPP: value += -20
-                    elif l4 == OPP and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == OPP: value += -30
-                if l2 == r1 == AI and l1 == NULL:
-                    if l3 == NULL and r2 == NULL: value += 1500; three_win_shape += 1; threat = 3
-                    elif l3 == OPP and r2 == NULL: value += 80
-                    elif l3 == NULL and r2 == OPP: value += 65
-                    elif l3 == ILLEGAL and r2 == NULL: value += 50
-                    elif l3 == NULL and r2 == ILLEGAL: value += 40
-                    elif l3 == OPP and r2 == OPP: value += -20
-                    elif l3 == OPP and r2 == ILLEGAL: value += -25
-                    elif l3 == ILLEGAL and r2 == OPP: value += -30
-                if l1 == r1 == AI:
-                    if l2 == NULL and r2 == NULL: value += 2000; three_win_shape += 1; threat = 3
-                    elif l2 == OPP and r2 == NULL: value += 60
-                    elif l2 == NULL and r2 == OPP: value += 60
-                    elif l2 == ILLEGAL and r2 == NULL: value += 50
-                    elif l2 == NULL and r2 == ILLEGAL: value += 50
-                    elif l2 == OPP and r2 == OPP: value += -20
-                    elif l2 == OPP and r2 == ILLEGAL: value += -25
-                    elif l2 == ILLEGAL and r2 == OPP: value += -30
-                if l2 == r2 == AI:
-                    if l1 == NULL and r1 == NULL: value += 800; three_win_shape += 1; threat = 3
-                    elif l1 == OPP and r1 == NULL: value += 20
-                    elif l1 == NULL and r1 == OPP: value += 20
-                    elif l1 == OPP and r1 == OPP: value += -10
-                if r2 == l1 == AI and l1 == NULL:
-                    if r3 == NULL and l2 == NULL: value += 1500; three_win_shape += 1; threat = 3
-                    elif r3 == OPP and l2 == NULL: value += 80
-                    elif r3 == NULL and l2 == OPP: value += 65
-                    elif r3 == ILLEGAL and l2 == NULL: value += 50
-                    elif r3 == NULL and l2 == ILLEGAL: value += 40
-                    elif r3 == OPP and l2 == OPP: value += -20
-                    elif r3 == OPP and l2 == ILLEGAL: value += -25
-                    elif r3 == ILLEGAL and l2 == OPP: value += -30
-                if r2 == r1 == AI and r3 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 3000; three_win_shape += 1; threat = 3
-                    elif r4 == OPP and l1 == NULL: value += 1000
-                    elif r4 == ILLEGAL and l1 == NULL: value += 500
-                    elif r4 == NULL and l1 == OPP: value += 60
-                    elif r4 == NULL and l1 == ILLEGAL: value += 50
-                    elif r4 == OPP and l1 == OPP: value += -20
-                    elif r4 == OPP and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == OPP: value += -30
-                if r3 == r1 == AI and r2 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 1500; three_win_shape += 1; threat = 3
-                    elif r4 == OPP and l1 == NULL: value += 80
-                    elif r4 == NULL and l1 == OPP: value += 65
-                    elif r4 == ILLEGAL and l1 == NULL: value += 50
-                    elif r4 == NULL and l1 == ILLEGAL: value += 40
-                    elif r4 == OPP and l1 == OPP: value += -20
-                    elif r4 == OPP and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == OPP: value += -30
-                if r3 == r2 == AI and r1 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 1000; three_win_shape += 1; threat = 3
-                    elif r4 == OPP and l1 == NULL: value += 50
-                    elif r4 == NULL and l1 == OPP: value += 45
-                    elif r4 == NULL and l1 == ILLEGAL: value += 40
-                    elif r4 == ILLEGAL and l1 == NULL: value += 30
-                    elif r4 == OPP and l1 == OPP: value += -20
-                    elif r4 == OPP and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == OPP: value += -30
-
-                # 3-in-line to defend (shape of 2)
-                if l3 == l2 == OPP and l1 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 800; three_lost_shape += 1; threat = 3
-                    elif l4 == AI and r1 == NULL: value += 30
-                    elif l4 == NULL and r1 == AI: value += 25
-                    elif l4 == NULL and r1 == ILLEGAL: value += 20
-                    elif l4 == ILLEGAL and r1 == NULL: value += 15
-                    elif l4 == AI and r1 == AI: value += -20
-                    elif l4 == AI and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == AI: value += -30
-                if l3 == l1 == OPP and l2 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 1200; three_lost_shape += 1; threat = 3
-                    elif l4 == AI and r1 == NULL: value += 50
-                    elif l4 == NULL and r1 == AI: value += 45
-                    elif l4 == ILLEGAL and r1 == NULL: value += 40
-                    elif l4 == NULL and r1 == ILLEGAL: value += 30
-                    elif l4 == AI and r1 == AI: value += -20
-                    elif l4 == AI and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == AI: value += -30
-                if l2 == l1 == OPP and l3 == NULL:
-                    if l4 == NULL and r1 == NULL: value += 2400; three_lost_shape += 1; threat = 3
-                    elif l4 == AI and r1 == NULL: value += 800
-                    elif l4 == ILLEGAL and r1 == NULL: value += 400
-                    elif l4 == NULL and r1 == AI: value += 40
-                    elif l4 == NULL and r1 == ILLEGAL: value += 30
-                    elif l4 == AI and r1 == AI: value += -20
-                    elif l4 == AI and r1 == ILLEGAL: value += -25
-                    elif l4 == ILLEGAL and r1 == AI: value += -30
-                if l2 == r1 == OPP and l1 == NULL:
-                    if l3 == NULL and r2 == NULL: value += 1200; three_lost_shape += 1; threat = 3
-                    elif l3 == AI and r2 == NULL: value += 50
-                    elif l3 == NULL and r2 == AI: value += 45
-                    elif l3 == ILLEGAL and r2 == NULL: value += 40
-                    elif l3 == NULL and r2 == ILLEGAL: value += 30
-                    elif l3 == AI and r2 == AI: value += -20
-                    elif l3 == AI and r2 == ILLEGAL: value += -25
-                    elif l3 == ILLEGAL and r2 == AI: value += -30
-                if l1 == r1 == OPP:
-                    if l2 == NULL and r2 == NULL: value += 1600; three_lost_shape += 1; threat = 3
-                    elif l2 == AI and r2 == NULL: value += 40
-                    elif l2 == NULL and r2 == AI: value += 40
-                    elif l2 == ILLEGAL and r2 == NULL: value += 30
-                    elif l2 == NULL and r2 == ILLEGAL: value += 30
-                    elif l2 == AI and r2 == AI: value += -20
-                    elif l2 == AI and r2 == ILLEGAL: value += -25
-                    elif l2 == ILLEGAL and r2 == AI: value += -30
-                if l2 == r2 == OPP:
-                    if l1 == NULL and r1 == NULL: value += 640; three_lost_shape += 1; threat = 3
-                    elif l1 == AI and r1 == NULL: value += 15
-                    elif l1 == NULL and r1 == AI: value += 15
-                    elif l1 == AI and r1 == AI: value += -10
-                if r2 == l1 == OPP and r1 == NULL:
-                    if r3 == NULL and l2 == NULL: value += 1200; three_win_shape += 1; threat = 3
-                    elif r3 == AI and l2 == NULL: value += 50
-                    elif r3 == NULL and l2 == AI: value += 45
-                    elif r3 == ILLEGAL and l2 == NULL: value += 40
-                    elif r3 == NULL and l2 == ILLEGAL: value += 30
-                    elif r3 == AI and l2 == AI: value += -20
-                    elif r3 == AI and l2 == ILLEGAL: value += -25
-                    elif r3 == ILLEGAL and l2 == AI: value += -30
-                if r2 == r1 == OPP and r3 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 2400; three_win_shape += 1; threat = 3
-                    elif r4 == AI and l1 == NULL: value += 800
-                    elif r4 == ILLEGAL and l1 == NULL: value += 400
-                    elif r4 == NULL and l1 == AI: value += 40
-                    elif r4 == NULL and l1 == ILLEGAL: value += 30
-                    elif r4 == AI and l1 == AI: value += -20
-                    elif r4 == AI and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == AI: value += -30
-                if r3 == r1 == OPP and r2 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 1200; three_lost_shape += 1; threat = 3
-                    elif r4 == AI and l1 == NULL: value += 50
-                    elif r4 == NULL and l1 == AI: value += 45
-                    elif r4 == ILLEGAL and l1 == NULL: value += 40
-                    elif r4 == NULL and l1 == ILLEGAL: value += 30
-                    elif r4 == AI and l1 == AI: value += -20
-                    elif r4 == AI and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == AI: value += -30
-                if r3 == r2 == OPP and r1 == NULL:
-                    if r4 == NULL and l1 == NULL: value += 800; three_lost_shape += 1; threat = 3
-                    elif r4 == AI and l1 == NULL: value += 30
-                    elif r4 == NULL and l1 == AI: value += 25
-                    elif r4 == NULL and l1 == ILLEGAL: value += 20
-                    elif r4 == ILLEGAL and l1 == NULL: value += 15
-                    elif r4 == AI and l1 == AI: value += -20
-                    elif r4 == AI and l1 == ILLEGAL: value += -25
-                    elif r4 == ILLEGAL and l1 == AI: value += -30
-
-            # 2-in-position (shape of 1)
-            if threat <= 2:
-                if l3 == AI: value += 2
-                if l2 == AI: value += 6
-                if l1 == AI: value += 10
-                if r1 == AI: value += 10
-                if r2 == AI: value += 6
-                if r3 == AI: value += 2
-                if l3 == OPP: value += 1
-                if l2 == OPP: value += 3
-                if l1 == OPP: value += 5
-                if r1 == OPP: value += 5
-                if r2 == OPP: value += 3
-                if r3 == OPP: value += 1
+        # search in four directions with the pattern table: one lookup for each direction
+        if self.states is not None:
+            states, width = self.states, self.PADDED_WIDTH
+            index = (x + 5) * width + y + 5
+            shapes = 0
+            for step in (1, width, width + 1, 1 - width):    # horizontal, vertical, left diagonal, right diagonal
+                code = states[index - step] | states[index - 2 * step] << 2 | states[index - 3 * step] << 4 | \
+                       states[index - 4 * step] << 6 | states[index - 5 * step] << 8 | \
+                       states[index + step] << 10 | states[index + 2 * step] << 12 | states[index + 3 * step] << 14 | \
+                       states[index + 4 * step] << 16 | states[index + 5 * step] << 18
+                value += self.PATTERN_VALUES[code]
+                shapes += self.PATTERN_SHAPES[code]
+            four_win_shape, four_lost_shape = shapes & 255, (shapes >> 8) & 255
+            three_win_shape, three_lost_shape = (shapes >> 16) & 255, shapes >> 24
+
+        # search in four directions with the patterns
+        else:
+            pattern_data = [
+                self.get_horz_pattern(x, y),
+                self.get_vert_pattern(x, y),
+                self.get_left_diag_pattern(x, y),
+                self.get_right_diag_pattern(x, y)
+            ]
+            for pattern in pattern_data:
+                pattern_value, four_win, four_lost, three_win, three_lost = self.calc_pattern_value(pattern, AI, OPP)
+                value += pattern_value
+                four_win_shape += four_win; four_lost_shape += four_lost
+                three_win_shape += three_win; three_lost_shape += three_lost
 
         # special shapes: double-four, double-three, four-three
 
@@ -672,11 +899,59 @@ class Evaluator():
 
         self.heuristic_moves[move] += win_value if win_value >= lost_value else lost_value
 
+    def search_forced_moves_batched(self, moves: list):
+
+        '''
+        Calculate the evaluation values of all given moves at once, the same as self.search_forced_moves() for each move.
+        The neighbourhoods of all moves are gathered from the padded board with numpy and scored by the pattern table.
+        Fall back to self.search_forced_moves() without numpy or the pattern table.
+        '''
+        if numpy is None or self.states is None or len(moves) <= 1:
+            for move in moves: self.search_forced_moves(move)
+            return
+
+        # constant data of the padded board, computed once
+        width = self.PADDED_WIDTH
+        if width not in Evaluator.BATCH_DATA:
+
+            # 10 positions around each move in four directions: offsets on the padded board and their shifts in the pattern code
+            steps = numpy.array([1, width, width + 1, 1 - width])    # horizontal, vertical, left diagonal, right diagonal
+            distances = numpy.array([-1, -2, -3, -4, -5, 1, 2, 3, 4, 5])    # (l1, ..., l5, r1, ..., r5)
+            offsets = steps[:, None] * distances[None, :]
+            shifts = numpy.arange(0, 20, 2, dtype = numpy.int32)
+
+            # factors of special shapes (double-four, double-three, four-three) as in self.search_forced_moves(): [four shapes, three shapes]
+            factors = numpy.ones((13, 13), dtype = numpy.int64)    # at most three shapes of a kind in each of four directions
+            for four_shape in range(13):
+                for three_shape in range(13):
+                    if four_shape + three_shape > 2: factors[four_shape, three_shape] = 800
+            factors[2, 0], factors[1, 1], factors[0, 2] = 400, 200, 100    # double-four, four-three, double-three
+            Evaluator.BATCH_DATA[width] = offsets, shifts, factors
+        offsets, shifts, factors = Evaluator.BATCH_DATA[width]
+
+        # pattern codes of all moves and directions: [move, direction]
+        states = numpy.asarray(self.states, dtype = numpy.int32)    # no copy if the states are kept as an array
+        indices = numpy.array([(x + 5) * width + y + 5 for x, y in moves])
+        codes = (states[indices[:, None, None] + offsets[None, :, :]] << shifts).sum(axis = 2)
+
+        # evaluation values and special shapes summed over four directions
+        values = numpy.frombuffer(self.PATTERN_VALUES, dtype = numpy.int64)[codes].sum(axis = 1)
+        shapes = numpy.frombuffer(self.PATTERN_SHAPES, dtype = numpy.dtype(self.PATTERN_SHAPES.typecode))[codes].astype(numpy.int64).sum(axis = 1)
+        four_win_shape, four_lost_shape = shapes & 255, (shapes >> 8) & 255
+        three_win_shape, three_lost_shape = (shapes >> 16) & 255, shapes >> 24
+
+        # special shapes: the larger value of the win and lost shapes
+        best_values = numpy.maximum(values * factors[four_win_shape, three_win_shape], values * factors[four_lost_shape, three_lost_shape])
+
+        for move, value in zip(moves, best_values.tolist()): self.heuristic_moves[move] += value
+
     def get_surrounding_moves(self) -> list:
 
         '''
         Return surrounding moves of pieces on the current board.
         '''
+        if self.candidates is not None: return list(self.candidates.moves)    # incrementally maintained frontier
+        if self.bitboard is not None: return self.bitboard.get_surrounding_moves()    # bitwise expansion of the pieces
         next_moves = []
         for x in range(self.HEIGHT):
             for y in range(self.WIDTH):
@@ -701,8 +976,9 @@ class Evaluator():
         if available_moves == []: return True, ((self.HEIGHT - 1) // 2, (self.WIDTH - 1) // 2)    # choice for first round: center position of the board
 
         ### search for forced moves with heuristic knowledge: self.search_forced_moves()
+        self.set_pattern_states()
         self.heuristic_moves = collections.defaultdict(int)
-        for move in available_moves: self.search_forced_moves(move)
+        self.search_forced_moves_batched(available_moves)
         forced_moves = list(self.heuristic_moves.keys())
         if len(forced_moves) != 0: return True, max(forced_moves, key = lambda x: self.heuristic_moves[x])    # get best move
         else: return False, None
@@ -715,9 +991,13 @@ class Evaluator():
         
         # initialize the board data
         self.board = board    # an instance of class Board
-        self.grid = board.grid    # a 2-dimension list
+        self.bitboard = board.bitboard    # an instance of class BitBoard or None
+        self.candidates = board.candidates    # an instance of class Candidates or None
         self.turn = board.turn    # 1: turn to AI, 2: turn to opponent
 
+        # the 2-dimension list is only needed by the heuristic patterns on a bitboard
+        if self.bitboard is None or use_heuristic: self.grid = board.grid
+
         #####################################################
         ### First strategy: Search for FORCED moves       ###
         ### Second strategy: Search for SURROUNDING moves ###
@@ -731,18 +1011,74 @@ class Evaluator():
         ### Second strategy: Expand SURROUNDING positions in the range of three
         return self.get_surrounding_moves()
 
-    # functions for self.get_board_with_move()
-    def get_board_with_move(self, board, move: tuple):
+    def generate_staged_moves(self, board, priority: list = None, block_threes: bool = False):
 
         '''
-        Return a new instance of class Board with a move inherited by the current board. 
+        Yield (move, score) of the surrounding moves of the board in stages: fives, blocks of fives, fours, open threes,
+        then other moves by heuristic knowledge (score None for moves of the forcing stages).
+        With block_threes, if the opponent has an open three, its blocks (positions making its open four) come right after
+        the fours instead of the open threes, which are then only ordered by heuristic knowledge: a three doesn't stop the open four.
+        A stage is only computed when the moves of the previous stages are used up, e.g. not after an early cutoff.
+        The priority (a 2-dimension list, e.g. a history table) orders the last stage before the heuristic score.
         '''
-        self.grid = [[i for i in board.grid[row]] for row in range(self.HEIGHT)]    # self.grid: a deep copy of board.grid
-        self.grid[move[0]][move[1]] = board.turn
-        return Board(grid = self.grid, turn = 3 - board.turn)    # next turn to opponent
+
+        # get available moves of the current board
+        grid, turn = board.grid, board.turn
+        self.bitboard, self.candidates, self.grid = board.bitboard, board.candidates, grid
+        available_moves = self.get_surrounding_moves()    # surrounding positions in the range of three: [(x, y)]
+        if available_moves == []: yield ((self.HEIGHT - 1) // 2, (self.WIDTH - 1) // 2), None; return    # choice for first round: center position of the board
+        staged_moves = set()
+
+        # first and second stages: fives of turn, then fives of the opponent to block
+        for player in (turn, 3 - turn):
+            self.bitboard, self.candidates, self.grid = board.bitboard, board.candidates, grid    # other boards may be searched between two stages
+            five_moves = []
+            for x, y in available_moves:
+                grid[x][y] = player
+                if self.is_win_move((x, y)): five_moves.append((x, y))
+                grid[x][y] = 0
+            for move in five_moves:
+                if move not in staged_moves: staged_moves.add(move); yield move, None
+
+        # third stage: fours of turn, and open threes of turn (free positions of at least three windows with three pieces)
+        four_moves, three_moves = [], []
+        for x, y in available_moves:
+            if (x, y) in staged_moves: continue
+            grid[x][y] = turn
+            if self.get_threat_moves(grid, (x, y), turn): four_moves.append((x, y))
+            elif len(self.get_threat_moves(grid, (x, y), turn, pieces = 3)) >= 3: three_moves.append((x, y))
+            grid[x][y] = 0
+        for move in four_moves:
+            staged_moves.add(move); yield move, None
+
+        # fourth stage: blocks of open threes of the opponent if asked, otherwise (or without any) open threes of turn
+        block_moves = []
+        if block_threes:
+            for x, y in available_moves:
+                if (x, y) in staged_moves: continue
+                grid[x][y] = 3 - turn
+                if len(self.get_threat_moves(grid, (x, y), 3 - turn)) >= 2: block_moves.append((x, y))
+                grid[x][y] = 0
+        for move in block_moves or three_moves:
+            staged_moves.add(move); yield move, None
+
+        # last stage: other moves scored by self.search_forced_moves_batched()
+        self.bitboard, self.candidates, self.grid, self.turn = board.bitboard, board.candidates, grid, turn
+        self.set_pattern_states()
+        self.heuristic_moves = collections.defaultdict(int)
+        other_moves = [move for move in available_moves if move not in staged_moves]
+        self.search_forced_moves_batched(other_moves)
+        scores = self.heuristic_moves
+        if priority is None: other_moves.sort(key = lambda x: scores[x], reverse = True)
+        else: other_moves.sort(key = lambda x: (priority[x[0]][x[1]], scores[x]), reverse = True)
+        for move in other_moves: yield move, scores[move]
 
 
 class Old_Evaluator():
+
+    # precomputed data shared by evaluators of the same board size: {(HEIGHT, WIDTH): tuple}
+    PRECOMPUTED = {}
+    VECTORIZED = {}    # numpy arrays for self.get_board_value_vectorized()
     
     def __init__(self):
 
@@ -806,6 +1142,90 @@ class Old_Evaluator():
         # SCORE data
         self.score = 0
 
+        # PRECOMPUTED data: location scores, 5-windows, windows covering each position and pattern scores by code
+        if (self.HEIGHT, self.WIDTH) not in Old_Evaluator.PRECOMPUTED:
+            Old_Evaluator.PRECOMPUTED[(self.HEIGHT, self.WIDTH)] = self.precompute()
+        self.location_score, self.windows, self.cell_windows, self.pattern_base, self.pattern_round = \
+            Old_Evaluator.PRECOMPUTED[(self.HEIGHT, self.WIDTH)]
+
+        # INCREMENTAL data: kept in step with self.make_move() and self.unmake_move()
+        self.codes = [0] * len(self.windows)    # pattern code of each 5-window
+        self.base_score = 0    # total round-independent score of patterns and locations
+        self.round_score = 0    # total score of patterns per round
+
+    # functions for precomputation
+    def precompute(self) -> tuple:
+
+        '''
+        Return the data which only depends on the board size.
+        '''
+
+        # location of the center of the board
+        x_center, y_center = (self.HEIGHT - 1) / 2, (self.WIDTH - 1) / 2
+
+        # score of each position
+        location_score = [
+            [
+                100 * min(
+                    math.floor(x_center - abs(x - x_center)), 
+                    math.floor(y_center - abs(y - y_center))
+                ) 
+                for y in range(self.WIDTH)
+            ] 
+            for x in range(self.HEIGHT)
+        ]
+
+        # all 5-windows in four directions, in the same order of positions as the patterns in self.calc_dir_score()
+        windows = []
+        for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for x in range(self.HEIGHT):
+                for y in range(self.WIDTH):
+                    if 0 <= x + 4 * dx < self.HEIGHT and 0 <= y + 4 * dy < self.WIDTH:
+                        windows.append(tuple((x + i * dx, y + i * dy) for i in range(5)))
+
+        # windows covering each position: [(window index, weight of the position in the pattern code)]
+        cell_windows = [[[] for y in range(self.WIDTH)] for x in range(self.HEIGHT)]
+        for index, window in enumerate(windows):
+            for i, (x, y) in enumerate(window):
+                cell_windows[x][y].append((index, 4 ** i))
+
+        # pattern scores by code (kind of the i-th position * 4 ** i): score = base + round * per round
+        scores = []
+        for rounds in (0, 1):
+            self.round = rounds
+            self.update_pattern_score()
+            scores.append([
+                self.AI_PATTERN.get(pattern, 0) + self.OPP_PATTERN.get(pattern, 0) + self.BLOCK_PATTERN.get(pattern, 0)
+                for pattern in (tuple((code >> 2 * i) & 3 for i in range(5)) for code in range(4 ** 5))
+            ])
+        self.round = 0
+        self.update_pattern_score()
+        pattern_base = scores[0]
+        pattern_round = [scores[1][code] - scores[0][code] for code in range(4 ** 5)]
+
+        return location_score, windows, cell_windows, pattern_base, pattern_round
+
+    def precompute_vectorized(self) -> tuple:
+
+        '''
+        Return the numpy data which only depends on the board size, for self.get_board_value_vectorized().
+        '''
+
+        # scores of locations and patterns by code as lookup vectors
+        location_score = numpy.array(self.location_score, dtype = numpy.int64)
+        pattern_base = numpy.array(self.pattern_base, dtype = numpy.int64)
+        pattern_round = numpy.array(self.pattern_round, dtype = numpy.int64)
+        weights = numpy.array([4 ** i for i in range(5)], dtype = numpy.int16)    # weight of the i-th position in the pattern code
+
+        # first positions of the 5-windows in four directions as flat indices: [(shift of the direction, indices)]
+        x, y = numpy.indices((self.HEIGHT, self.WIDTH))
+        starts = [
+            (dx * self.WIDTH + dy, numpy.flatnonzero((x + 4 * dx < self.HEIGHT) & (0 <= y + 4 * dy) & (y + 4 * dy < self.WIDTH)))
+            for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1))
+        ]
+
+        return location_score, pattern_base, pattern_round, weights, starts
+
     # functions for self.get_board_value()
     def get_round(self) -> int:
 
@@ -900,7 +1320,7 @@ class Old_Evaluator():
             for x in range(5, y + 1):
                 
                 # traverse the pattern in given right diagonal
-                right_diag.pop(0); right_diag.append(self.board[x][x - y])
+                right_diag.pop(0); right_diag.append(self.board[x][y - x])
                 self.calc_pattern_score(right_diag)
 
         # traverse all right diagonal patterns in lower-right half of the current board
@@ -922,26 +1342,11 @@ class Old_Evaluator():
         Calculate the total score of the current board in location.
         '''
 
-        # location of the center of the board
-        x_center, y_center = (self.HEIGHT - 1) / 2, (self.WIDTH - 1) / 2
-
-        # calculate the score of each position
-        location_score = [
-            [
-                100 * min(
-                    math.floor(x_center - abs(x - x_center)), 
-                    math.floor(y_center - abs(y - y_center))
-                ) 
-                for x in range(self.HEIGHT)
-            ] 
-            for y in range(self.WIDTH)
-        ]
-
-        # sum the score
+        # sum the score with the precomputed score of each position
         for x in range(self.HEIGHT):
             for y in range(self.WIDTH):
-                if self.board[x][y] == 1: self.score += location_score[x][y]
-                elif self.board[x][y] == 2: self.score -= location_score[x][y]
+                if self.board[x][y] == 1: self.score += self.location_score[x][y]
+                elif self.board[x][y] == 2: self.score -= self.location_score[x][y]
 
     def calc_dir_score(self):
 
@@ -1012,259 +1417,2038 @@ class Old_Evaluator():
 
         return self.score
 
+    def get_board_value_vectorized(self, board: list) -> int:
 
-### structures
-class Board():
+        '''
+        Return the evaluation value of the current board with numpy, the same as self.get_board_value().
+        Fall back to self.get_board_value() without numpy.
+        '''
+        if numpy is None: return self.get_board_value(board)
 
-    def __init__(self, grid: list, turn: int):
-        
-        self.grid = grid    # a 2-dimension list: [[x, ..., x], ..., [x, ..., x]]
-        self.turn = turn    # 1: turn to AI, 2: turn to opponent
-        evaluator = Evaluator()    # evaluator for the current board
-        self.is_terminal = evaluator.is_terminal(grid, turn)    # terminal board: board in the state of WIN (1) or DRAW (-1)
+        # get the precomputed numpy data of the board size
+        if (self.HEIGHT, self.WIDTH) not in Old_Evaluator.VECTORIZED:
+            Old_Evaluator.VECTORIZED[(self.HEIGHT, self.WIDTH)] = self.precompute_vectorized()
+        location_score, pattern_base, pattern_round, weights, starts = Old_Evaluator.VECTORIZED[(self.HEIGHT, self.WIDTH)]
 
+        # encode the board as a flat array, padded so that the windows of the last positions stay in the buffer
+        grid = numpy.array([row[:self.WIDTH] for row in board[:self.HEIGHT]], dtype = numpy.int8)
+        cells = self.HEIGHT * self.WIDTH
+        flat = numpy.zeros(cells + 4 * (self.WIDTH + 1), dtype = numpy.int8)
+        flat[:cells] = grid.ravel()
 
-class Node():
+        # score of the location and rounds (the number of AI pieces)
+        ai_pieces, opp_pieces = grid == 1, grid == 2
+        rounds = int(numpy.count_nonzero(ai_pieces))
+        score = int(location_score[ai_pieces].sum()) - int(location_score[opp_pieces].sum())
 
-    def __init__(self, board, parent):
+        # pattern codes of all 5-windows in four directions by stride tricks: the window of each position as a row
+        step = flat.strides[0]
+        codes = numpy.concatenate([
+            numpy.lib.stride_tricks.as_strided(flat, shape = (cells, 5), strides = (step, shift * step), writeable = False)[indices] @ weights
+            for shift, indices in starts
+        ])
+        score += int(pattern_base[codes].sum()) + rounds * int(pattern_round[codes].sum())
 
-        self.board = board    # an instance of class Board
-        self.turn = board.turn    # 1: turn to AI, 2: turn to opponent
-        self.is_leaf = board.is_terminal    # leaf node: board in the state of WIN (1) or DRAW (-1)
-        self.is_fully_expanded = self.is_leaf    # no node to expand if it is a leaf node
+        return score
 
-        self.visit_times = 0    # total times of being visited
-        self.win_times = 0    # total times of winning if this node is visited
+    def benchmark(self, board: list, seconds: float = 1.0, vectorized: bool = True) -> float:
 
-        self.parent = parent    # the parent of the given node: Node
-        self.children = {}    # the children of the given node: {(x, y): Node}
+        '''
+        Return the number of evaluations of the given board per second.
+        '''
+        get_board_value = self.get_board_value_vectorized if vectorized else self.get_board_value
+        evaluations, start_time = 0, time.time()
+        while evaluations == 0 or time.time() - start_time < seconds:
+            get_board_value(board)
+            evaluations += 1
+        return evaluations / (time.time() - start_time)
 
+    # functions for incremental evaluation
+    def set_board(self, board: list):
 
-### algorithms
-class Minimax_with_Alpha_Beta_Pruning():
+        '''
+        Initialize the incremental score of the given board.
+        '''
+        self.codes = [0] * len(self.windows)
+        self.base_score, self.round_score, self.round = 0, 0, 0
+        for x in range(self.HEIGHT):
+            for y in range(self.WIDTH):
+                if board[x][y] != 0: self.make_move(x, y, board[x][y])
 
+    def update_move(self, x: int, y: int, kind: int):
 
-    def __init__(self):
+        '''
+        Update the incremental score when position (x, y) changes by kind (positive: put a piece, negative: remove it).
+        '''
 
-        # board data
-        self.WIDTH = pp.width
-        self.HEIGHT = pp.height
+        # re-score the windows covering the position
+        for index, weight in self.cell_windows[x][y]:
+            code = self.codes[index]
+            self.base_score -= self.pattern_base[code]
+            self.round_score -= self.pattern_round[code]
+            code += kind * weight
+            self.codes[index] = code
+            self.base_score += self.pattern_base[code]
+            self.round_score += self.pattern_round[code]
 
-        # evaluator for score
-        self.old_evaluator = Old_Evaluator()
-        self.evaluator = Evaluator()
+        # score of the location and rounds (the number of AI pieces)
+        if abs(kind) == 1: self.base_score += kind * self.location_score[x][y]; self.round += kind
+        elif abs(kind) == 2: self.base_score -= kind // 2 * self.location_score[x][y]
 
-        # store the result
-        self.best_move = None
+    def make_move(self, x: int, y: int, turn: int):
 
-        # constant data
-        self.INF = float('inf')
+        '''
+        Put a piece of the given turn on position (x, y) and update the incremental score.
+        '''
+        self.update_move(x, y, turn)
 
-    def DFS(self, depth, turn, alpha, beta) -> int:
+    def unmake_move(self, x: int, y: int, turn: int):
 
         '''
-        Use Depth First Search to search the Minimax Tree.
+        Remove a piece of the given turn from position (x, y) and update the incremental score.
         '''
+        self.update_move(x, y, -turn)
 
-        # score of leaf node 
-        if depth == 1: return self.old_evaluator.get_board_value(self.board)
-        
-        # traverse all child nodes with alpha-beta pruning
-        for x, y in self.get_next_moves(turn):
+    def get_score(self) -> int:
 
-            # recursion by DFS
-            self.board[x][y] = turn    # 1: turn to AI, 2: turn to opponent
-            value = self.DFS(depth = depth - 1, turn = 3 - turn, alpha = alpha, beta = beta)
-            self.board[x][y] = 0
+        '''
+        Return the incremental evaluation value, the same as self.get_board_value() of the current board.
+        '''
+        return self.base_score + self.round * self.round_score
 
-            # MAX node    
-            if turn == 1:
-                self.best_move = (x, y) if alpha < value else self.best_move
-                alpha = max(alpha, value)
 
-            # MIN node
-            else:
-                self.best_move = (x, y) if beta > value else self.best_move
-                beta = min(beta, value)
-            
-            # pruning
-            if alpha >= beta:
-                break
+### structures
+class BitBoard():
+
+    def __init__(self, height: int, width: int, grid: list = None):
+
+        # the size of board
+        self.HEIGHT = height
+        self.WIDTH = width
+        self.STRIDE = width + 1    # one empty guard column at the end of each row: lines never wrap to the next row
+
+        # shifts of four directions: horizontal, vertical, left diagonal, right diagonal
+        self.SHIFTS = (1, self.STRIDE, self.STRIDE + 1, self.STRIDE - 1)
 
-        return alpha
+        # mask of all positions on the board (without guard columns)
+        self.MASK = sum(((1 << width) - 1) << (x * self.STRIDE) for x in range(height))
 
-    def is_free_move(self, x, y) -> bool:
+        # bitsets of pieces: [unused, AI, opponent, block], bit x * STRIDE + y stands for position (x, y)
+        self.bits = [0, 0, 0, 0]
+        if grid is not None:
+            for x in range(height):
+                for y in range(width):
+                    if grid[x][y] != 0: self.bits[grid[x][y]] |= 1 << (x * self.STRIDE + y)
+
+    def copy(self):
 
         '''
-        Check whether position (x, y) is available and free (with value 0).
+        Return a copy of the bitboard (only the bitsets are copied).
         '''
-        return 0 <= x < self.HEIGHT and 0 <= y < self.WIDTH and self.board[x][y] == 0
+        bitboard = BitBoard.__new__(BitBoard)
+        bitboard.__dict__.update(self.__dict__)    # share the constant data
+        bitboard.bits = self.bits[:]
+        return bitboard
+
+    def get(self, move: tuple) -> int:
 
-    def get_next_moves(self, turn, use_heuristic = True) -> list:
-        
         '''
-        Return a list of next moves as children of the root in Minimax Tree.
+        Return the kind of position move = (x, y): 0: null, 1: AI, 2: opponent, 3: block.
         '''
+        bit = 1 << (move[0] * self.STRIDE + move[1])
+        for turn in (1, 2, 3):
+            if self.bits[turn] & bit: return turn
+        return 0
 
-        #####################################################
-        ### First strategy: Search for FORCED moves       ###
-        ### Second strategy: Search for SURROUNDING moves ###
-        #####################################################
+    def place(self, move: tuple, turn: int):
 
-        ### First strategy: Use heuristic knowledge to search FORCED moves
-        if use_heuristic:
-            best_forced_move = self.evaluator.get_next_moves(Board(self.board, turn), use_heuristic = True)    # 1: turn to AI, 2: turn to opponent
-            return best_forced_move
+        '''
+        Put a piece of the given turn on position move = (x, y).
+        '''
+        self.bits[turn] |= 1 << (move[0] * self.STRIDE + move[1])
 
-        ### Second strategy: Expand SURROUNDING positions in the range of three
-        next_moves = []
-        for x in range(self.HEIGHT):
-            for y in range(self.WIDTH):
-                if self.board[x][y] != 0:
-                    next_moves.extend([
-                        (x - 3, y), (x - 2, y), (x - 1, y), (x + 1, y), (x + 2, y), (x + 3, y),    # horizontal
-                        (x, y - 3), (x, y - 2), (x, y - 1), (x, y + 1), (x, y + 2), (x, y + 3),    # vertical
-                        (x - 3, y - 3), (x - 2, y - 2), (x - 1, y - 1), (x + 1, y + 1), (x + 2, y + 2), (x + 3, y + 3),    # left diagonal
-                        (x + 3, y - 3), (x + 2, y - 2), (x + 1, y - 1), (x - 1, y + 1), (x - 2, y + 2), (x - 3, y + 3)    # right diagonal
-                    ])
-        return [(x, y) for x, y in list(set(next_moves)) if self.is_free_move(x, y)]    # delete illegal nodes
+    def remove(self, move: tuple, turn: int):
+
+        '''
+        Remove a piece of the given turn from position move = (x, y).
+        '''
+        self.bits[turn] &= ~(1 << (move[0] * self.STRIDE + move[1]))
 
-    def get_best_move(self, board, depth = 5) -> tuple:
+    def count_pieces(self) -> int:
 
         '''
-        Return the best move (x, y) with Minimax.
+        Return the number of pieces on the board.
         '''
-        self.board = board
-        self.DFS(depth = depth, turn = 1, alpha = -self.INF, beta = self.INF)
-        return self.best_move
+        return bin(self.bits[1] | self.bits[2] | self.bits[3]).count('1')
 
+    def is_win(self, turn: int) -> bool:
 
-class MCTS():
+        '''
+        Check whether the given turn has five pieces in a line.
+        '''
+        bits = self.bits[turn]
+        for shift in self.SHIFTS:
+            pair = bits & (bits >> shift)    # two in a line
+            if pair & (pair >> 2 * shift) & (bits >> 4 * shift): return True    # two pairs and the fifth piece
+        return False
 
-    def __init__(self, sample_size: int):
+    def is_win_move(self, move: tuple) -> bool:
 
-        self.evaluator = Evaluator()    # evaluator for the current board
-        self.sample_size = sample_size    # total times to run MCTS
-        self.confidence_level = 1.96    # confidence level of the UCT
+        '''
+        Check whether the piece on position move = (x, y) is in a win pattern (only four lines through the move).
+        '''
+        index = move[0] * self.STRIDE + move[1]
+        bits = self.bits[self.get(move)]    # pieces of the player who placed the last piece
+        for shift in self.SHIFTS:
 
-    def search(self, board) -> tuple:
+            # count continuous pieces on both sides: guard columns and the ends of the bitset stop the rays
+            count = 1
+            i = index + shift
+            while bits >> i & 1: count += 1; i += shift
+            i = index - shift
+            while i >= 0 and bits >> i & 1: count += 1; i -= shift
+            if count >= 5: return True    # same as self.is_win() on the lines through the move
+
+        return False
+
+    def get_surrounding_moves(self) -> list:
 
         '''
-        Use MCTS to search the best move for the given board.
+        Return free positions within the range of three from any piece.
         '''
+        pieces = self.bits[1] | self.bits[2] | self.bits[3]
+        surrounding = 0
+        for shift in self.SHIFTS:
+            forward, backward = pieces, pieces
+            for _ in range(3):
+                forward = (forward << shift) & self.MASK    # masking each step keeps the ray on the board
+                backward = (backward >> shift) & self.MASK
+                surrounding |= forward | backward
+        surrounding &= ~pieces
 
-        # search forced move
-        # forced_move = self.evaluator.get_next_moves(board = board, use_heuristic = True)
-        # if len(forced_move) == 1: return forced_move[0]
+        # decode the bitset into positions
+        next_moves = []
+        while surrounding:
+            bit = surrounding & -surrounding    # the lowest set bit
+            next_moves.append(divmod(bit.bit_length() - 1, self.STRIDE))
+            surrounding ^= bit
+        return next_moves
 
-        # construct the root of Monte Carlo Tree
-        self.root = Node(board, None)    # no parent
+    def to_grid(self) -> list:
 
-        # play the game for sample_size times
-        for i in range(self.sample_size):
+        '''
+        Return the board as a 2-dimension list.
+        '''
+        grid = [[0 for y in range(self.WIDTH)] for x in range(self.HEIGHT)]
+        for turn in (1, 2, 3):
+            bits = self.bits[turn]
+            while bits:    # only visit the set bits
+                bit = bits & -bits
+                x, y = divmod(bit.bit_length() - 1, self.STRIDE)
+                grid[x][y] = turn
+                bits ^= bit
+        return grid
 
-            # First Step: Selection & Second Step: Expansion
-            node = self.selection(self.root)    # select the node with higher possibility
 
-            # Third Step: Simulation
-            result = self.simulation(node.board)    # only need the result: 0 or 1
+class Candidates():
 
-            # Fourth step: Backpropagation
-            self.backpropogation(node, result)    # update each node on the path
+    # precomputed neighbours shared by candidates of the same board size: {(HEIGHT, WIDTH): list}
+    NEIGHBOURS = {}
 
-        # get the best move from the root node
-        return self.get_best_move(self.root)
+    def __init__(self, height: int, width: int, grid: list = None):
 
-    def selection(self, node):
+        # the size of board
+        self.HEIGHT = height
+        self.WIDTH = width
+
+        # positions in the range of three on eight rays of each position: [[(index, (x, y))]], index = x * WIDTH + y
+        if (height, width) not in Candidates.NEIGHBOURS:
+            Candidates.NEIGHBOURS[(height, width)] = [
+                [
+                    ((x + i * dx) * width + y + i * dy, (x + i * dx, y + i * dy))
+                    for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1))
+                    for i in (-3, -2, -1, 1, 2, 3)
+                    if 0 <= x + i * dx < height and 0 <= y + i * dy < width
+                ]
+                for x in range(height) for y in range(width)
+            ]
+        self.neighbours = Candidates.NEIGHBOURS[(height, width)]
+
+        # state of positions
+        self.counts = bytearray(height * width)    # the number of pieces in the range of three on eight rays
+        self.occupied = bytearray(height * width)    # 1: position with a piece, 0: free position
+        self.moves = set()    # frontier: free positions with at least one piece in range
+
+        # add pieces of the given grid
+        if grid is not None:
+            for x in range(height):
+                for y in range(width):
+                    if grid[x][y] != 0: self.add((x, y))
+
+    def add(self, move: tuple):
 
         '''
-        Return the node selected by MCTS policy.
+        Update the candidate moves when a piece is put on position move = (x, y).
         '''
-        while not node.is_leaf:
-            if node.is_fully_expanded: node = self.get_best_child(node)    # search in depth
-            else: return self.expansion(node)    # search in breadth
-        return node    # get the leaf node
+        index = move[0] * self.WIDTH + move[1]
+        self.occupied[index] = 1
+        self.moves.discard(move)
+        for neighbour, position in self.neighbours[index]:
+            self.counts[neighbour] += 1
+            if not self.occupied[neighbour]: self.moves.add(position)
 
-    def expansion(self, node):
+    def remove(self, move: tuple):
 
         '''
-        Return a new node for expansion in the Monte Carlo Tree.
+        Update the candidate moves when the piece on position move = (x, y) is removed.
         '''
+        index = move[0] * self.WIDTH + move[1]
+        self.occupied[index] = 0
+        if self.counts[index]: self.moves.add(move)
+        for neighbour, position in self.neighbours[index]:
+            self.counts[neighbour] -= 1
+            if not self.counts[neighbour]: self.moves.discard(position)
 
-        # get next moves from the current board
-        next_moves = self.evaluator.get_next_moves(node.board)
 
-        # traverse all next moves
-        for move in next_moves:
+class Threat_Windows():
 
-            # a move hasn't been visited
-            if move not in node.children.keys():
-                
-                # generate a new node with this move
-                child = Node(self.evaluator.get_board_with_move(node.board, move), node)
-                node.children[move] = child
+    # precomputed windows of five shared by threat windows of the same board size: {(HEIGHT, WIDTH): (windows, windows of positions)}
+    WINDOWS = {}
 
-                # the node is fully expanded
-                if len(next_moves) == len(node.children): node.is_fully_expanded = True
+    def __init__(self, height: int, width: int, grid: list = None):
 
-                # get the selected child node
-                return child
+        # the size of board
+        self.HEIGHT = height
+        self.WIDTH = width
 
-    def simulation(self, board) -> bool:
+        # windows of five positions in four directions: [[(x, y)] * 5], and the windows through each position: [[window]]
+        if (height, width) not in Threat_Windows.WINDOWS:
+            windows = [
+                [(x + k * dx, y + k * dy) for k in range(5)]
+                for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1))
+                for x in range(height) for y in range(width)
+                if 0 <= x + 4 * dx < height and 0 <= y + 4 * dy < width
+            ]
+            position_windows = [[] for i in range(height * width)]
+            for window, positions in enumerate(windows):
+                for x, y in positions: position_windows[x * width + y].append(window)
+            Threat_Windows.WINDOWS[(height, width)] = (windows, position_windows)
+        self.windows, self.position_windows = Threat_Windows.WINDOWS[(height, width)]
 
-        '''
-        Return the result of simulation which uses the simple policy.
-        '''
-        while not board.is_terminal:
-            opponent_move = random.choice(self.evaluator.get_next_moves(board))    # use simple policy to find next move
-            board = self.evaluator.get_board_with_move(board, opponent_move)    # a new Board with next move
-        if board.is_terminal == -1: return 0    # 0: root draws
-        else: return self.root.turn == board.turn    # 1: root wins, 0: root loses (opponent wins)
+        # state of windows
+        self.counts = [None, [0] * len(self.windows), [0] * len(self.windows), [0] * len(self.windows)]    # pieces of each kind in each window
+        self.threats = [None, set(), set()]    # windows with at least three pieces of turn and no other piece
+
+        # add pieces of the given grid
+        if grid is not None:
+            for x in range(height):
+                for y in range(width):
+                    if grid[x][y] != 0: self.add((x, y), grid[x][y])
 
-    def backpropogation(self, node, result: bool):
+    def update(self, window: int):
 
         '''
-        Backpropogate to the root node to update the state of each node on the path.
+        Update the threat windows of both turns with the counts of the given window.
         '''
-        while node is not None:    # the parent of the root is None
-            node.visit_times += 1
-            node.win_times += result    # 1: win, 0: lost or draw
-            node = node.parent    # backpropogation
+        counts = self.counts
+        for turn in (1, 2):
+            if counts[turn][window] >= 3 and counts[3 - turn][window] == 0 and counts[3][window] == 0: self.threats[turn].add(window)
+            else: self.threats[turn].discard(window)
 
-    def get_best_child(self, node):
+    def add(self, move: tuple, turn: int):
 
         '''
-        Return the best child with maximum UCT of the given node.
+        Update the windows when a piece of turn (3 for a block) is put on position move = (x, y).
         '''
+        counts = self.counts[turn]
+        for window in self.position_windows[move[0] * self.WIDTH + move[1]]:
+            counts[window] += 1
+            self.update(window)
 
-        # traverse all chidren of the node
-        best_value = -float('inf'); best_children = []
-        for child in node.children.values():
-
-            # compute the value of UCT
-            exploitation = child.win_times / child.visit_times    # exploitation: chance of winning
-            exploration = math.sqrt(math.log(node.visit_times) / child.visit_times)    # exploration: search more nodes
-            value = exploitation + self.confidence_level * exploration    # UCT: Upper Confidence Bound applied to Trees
-
-            # record the children with maximum UCT
-            if value > best_value: best_value = value; best_children = [child]    # only one child with maximum value
-            elif value == best_value: best_children.append(child)    # more than one child with maximum value
+    def remove(self, move: tuple, turn: int):
 
-        # choose one of the best children
-        return random.choice(best_children)
+        '''
+        Update the windows when the piece of turn on position move = (x, y) is removed.
+        '''
+        counts = self.counts[turn]
+        for window in self.position_windows[move[0] * self.WIDTH + move[1]]:
+            counts[window] -= 1
+            self.update(window)
 
-    def get_best_move(self, node) -> tuple:
+    def get_threat_moves(self, grid: list, turn: int) -> tuple:
 
         '''
-        Return the best move of the given node.
+        Return the five moves of turn: {(x, y)}, and its four moves with the five moves they make: {(x, y): {(x, y)}}.
+        A four move with at least two five moves makes an open four (or a double four), the same as Evaluator.get_threat_moves().
         '''
+        five_moves, four_moves = set(), collections.defaultdict(set)
+        for window in self.threats[turn]:
+            free_moves = [(x, y) for x, y in self.windows[window] if grid[x][y] == 0]
+            if len(free_moves) == 1: five_moves.add(free_moves[0])    # four pieces: the free position makes five
+            elif len(free_moves) == 2:    # three pieces: either free position makes a four, completed by the other
+                four_moves[free_moves[0]].add(free_moves[1])
+                four_moves[free_moves[1]].add(free_moves[0])
+        return five_moves, four_moves
 
-        # get the best child of the given node
-        best_child = self.get_best_child(node)
 
-        # get the move between the node and its best child
-        for move, child in node.children.items():
-            if child is best_child: return move
+class Board():
+
+    def __init__(self, grid: list, turn: int, move: tuple = None, pieces: int = None, bitboard = None, candidates = None):
+        
+        self._grid = grid    # a 2-dimension list: [[x, ..., x], ..., [x, ..., x]], built from the bitboard if None
+        self.bitboard = bitboard    # an instance of class BitBoard or None
+        self.candidates = candidates    # an instance of class Candidates or None
+        self.turn = turn    # 1: turn to AI, 2: turn to opponent
+        self.move = move    # the last move (x, y) leading to the current board, None if unknown
+        evaluator = Evaluator()    # evaluator for the current board
+        if bitboard is not None:
+            if pieces is None: pieces = bitboard.count_pieces()
+            self.pieces = pieces    # the number of pieces on the board
+            self.is_terminal = evaluator.is_terminal(bitboard, turn, move, pieces)    # terminal board: board in the state of WIN (1) or DRAW (-1)
+            return
+        if move is not None and pieces is None: pieces = evaluator.count_pieces(grid)
+        self.pieces = pieces    # the number of pieces on the board, None if unknown
+        self.is_terminal = evaluator.is_terminal(grid, turn, move, pieces)    # terminal board: board in the state of WIN (1) or DRAW (-1)
+
+    @property
+    def grid(self) -> list:
+
+        '''
+        Return the board as a 2-dimension list.
+        '''
+        if self._grid is None: self._grid = self.bitboard.to_grid()
+        return self._grid
+
+
+class Node():
+
+    __slots__ = ('move', 'turn', 'is_leaf', 'is_fully_expanded', 'untried_moves', 'proven', 'visit_times', 'win_times', 'amaf', 'parent', 'children')
+
+    def __init__(self, move, turn, is_leaf, parent):
+
+        self.move = move    # the move (x, y) leading to the node, None for the root: the board is rebuilt from the moves
+        self.turn = turn    # 1: turn to AI, 2: turn to opponent
+        self.is_leaf = is_leaf    # leaf node: board in the state of WIN (1) or DRAW (-1)
+        self.is_fully_expanded = self.is_leaf    # no node to expand if it is a leaf node
+        self.untried_moves = None    # generator of next moves not expanded yet: (x, y), None until the first expansion
+
+        # proven winner of the node by MCTS-Solver: 0: unknown, 1: AI, 2: opponent
+        self.proven = 0
+        if is_leaf == 1: self.proven = 3 - turn    # the player who moved last has five
+
+        self.visit_times = 0    # total times of being visited
+        self.win_times = 0    # total times of winning for the player who moved into the node (3 - turn) if this node is visited
+        self.amaf = None    # RAVE statistics of moves played later by the turn of the node: {(x, y): [visit times, win times of the turn]}
+
+        self.parent = parent    # the parent of the given node: Node
+        self.children = {}    # the children of the given node: {(x, y): Node}
+
+
+class Array_Tree():
+
+    def __init__(self, width: int):
+
+        # the size of board: move (x, y) is stored as x * WIDTH + y
+        self.WIDTH = width
+
+        # data of nodes in flat buffers: node i is stored in the i-th item of each buffer
+        self.visit_times = array.array('l')    # total times of being visited
+        self.win_times = array.array('l')    # total times of winning for the player who moved into the node if this node is visited
+        self.parent = array.array('l')    # index of the parent, -1 for the root
+        self.move = array.array('l')    # the move leading to the node, -1 for the root
+        self.is_leaf = array.array('b')    # leaf node: board in the state of WIN (1) or DRAW (-1)
+
+        # children of a node are stored together: [first_child, first_child + child_count) are expanded,
+        # [first_child + child_count, first_child + child_total) are reserved for moves not tried yet
+        self.first_child = array.array('l')    # index of the first child, -1 if the node is never expanded
+        self.child_count = array.array('l')    # number of expanded children
+        self.child_total = array.array('l')    # number of next moves of the node
+
+    def __len__(self) -> int:
+
+        '''
+        Return the number of nodes.
+        '''
+        return len(self.parent)
+
+    def add_node(self, parent: int, move: int) -> int:
+
+        '''
+        Add a node and return its index.
+        '''
+        for buffer, value in (
+            (self.visit_times, 0), (self.win_times, 0), (self.parent, parent), (self.move, move), (self.is_leaf, 0),
+            (self.first_child, -1), (self.child_count, 0), (self.child_total, 0)
+        ):
+            buffer.append(value)
+        return len(self.parent) - 1
+
+    def reserve_children(self, index: int, moves: list):
+
+        '''
+        Reserve the children of node index for the given next moves.
+        '''
+        self.first_child[index] = len(self.parent)
+        self.child_total[index] = len(moves)
+        for x, y in moves: self.add_node(index, x * self.WIDTH + y)
+
+    def get_move(self, index: int) -> tuple:
+
+        '''
+        Return the move (x, y) leading to node index.
+        '''
+        return divmod(self.move[index], self.WIDTH)
+
+
+class Tree_Node():
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index: int):
+
+        self.tree = tree    # an instance of class Array_Tree
+        self.index = index    # index of the node in the tree
+
+    @property
+    def visit_times(self) -> int:
+        return self.tree.visit_times[self.index]
+
+    @property
+    def win_times(self) -> int:
+        return self.tree.win_times[self.index]
+
+    @property
+    def is_leaf(self) -> int:
+        return self.tree.is_leaf[self.index]
+
+    @property
+    def parent(self):
+        parent = self.tree.parent[self.index]
+        return Tree_Node(self.tree, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> dict:
+        first = self.tree.first_child[self.index]
+        return {
+            self.tree.get_move(child): Tree_Node(self.tree, child)
+            for child in range(first, first + self.tree.child_count[self.index])
+        } if first >= 0 else {}
+
+
+### time management
+class Time_Manager():
+
+    def __init__(self, pieces: int = 0, budget: float = None):
+
+        # time data (seconds)
+        self.SAFETY_RATE = 0.8    # only use part of the allocated time: searches stop between iterations or samples
+        self.OVERHEAD = 0.1    # time reserved for communication with the manager
+        self.MIN_MOVES_LEFT = 10    # the least number of my moves expected in the rest of the game
+        self.MIN_BUDGET = 0.05    # budget when the manager asks for moves as fast as possible
+
+        # budget of the current move: allocated from the time limits if not given
+        self.start_time = time.time()
+        self.budget = self.get_budget(pieces) if budget is None else budget
+        self.deadline = self.start_time + self.budget
+
+    def get_budget(self, pieces: int) -> float:
+
+        '''
+        Return the time budget of the current move from the time limits of the turn and the match.
+        '''
+
+        # limit of the turn: 0 means playing as fast as possible
+        if pp.info_timeout_turn == 0: return self.MIN_BUDGET
+        budget = pp.info_timeout_turn / 1000
+
+        # limit of the match: share the time left among the expected moves left (0 means no limit)
+        if pp.info_timeout_match != 0:
+            moves_left = max(self.MIN_MOVES_LEFT, (pp.width * pp.height - pieces) // 10)
+            budget = min(budget, pp.info_time_left / 1000 / moves_left)
+
+        return max(self.MIN_BUDGET, budget * self.SAFETY_RATE - self.OVERHEAD)
+
+    def get_elapsed_time(self) -> float:
+
+        '''
+        Return the time used by the current move.
+        '''
+        return time.time() - self.start_time
+
+    def is_timeout(self) -> bool:
+
+        '''
+        Check whether the search should stop: the budget is used up or the manager terminates the AI.
+        '''
+        return bool(pp.terminateAI) or time.time() >= self.deadline
+
+
+### algorithms
+class Searcher():
+
+    '''
+    Board data shared by the searchers: the grid with its Zobrist hash and candidate moves, and the limits of the search.
+    Subclasses keep their own data in step by extending self.make_move() and self.unmake_move().
+    '''
+
+    # Zobrist keys shared by searchers of the same board size: {(HEIGHT, WIDTH): [x][y][turn] -> random 64-bit key}
+    ZOBRIST = {}
+
+    def __init__(self, max_nodes: int = None):
+
+        # board data
+        self.WIDTH = pp.width
+        self.HEIGHT = pp.height
+        self.grid = None    # 2-dimension list of the current board, changed in place by self.make_move() and self.unmake_move()
+        self.candidates = None    # candidate moves of the current board, kept in step with self.make_move() and self.unmake_move()
+
+        # Zobrist hashing: a random 64-bit key for each piece on each position, fixed seed for stable keys
+        if (self.HEIGHT, self.WIDTH) not in Searcher.ZOBRIST:
+            generator = random.Random(MAX_BOARD)
+            Searcher.ZOBRIST[(self.HEIGHT, self.WIDTH)] = [
+                [[generator.getrandbits(64) for turn in range(4)] for y in range(self.WIDTH)] for x in range(self.HEIGHT)
+            ]
+        self.zobrist = Searcher.ZOBRIST[(self.HEIGHT, self.WIDTH)]
+        self.hash = 0    # Zobrist hash of self.grid
+
+        # limits of the search: number of searched nodes (None for no limit) and time manager (None for no time limit)
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.time_manager = None
+        self.is_aborted = False    # the search is stopped by a limit
+
+    def set_grid(self, grid: list):
+
+        '''
+        Set the board to search on: the grid is changed in place.
+        '''
+        self.grid = grid
+        self.candidates = Candidates(self.HEIGHT, self.WIDTH, grid)
+        self.hash = self.get_hash()
+        self.evaluator.grid, self.evaluator.candidates = grid, self.candidates
+
+    def get_hash(self) -> int:
+
+        '''
+        Return the Zobrist hash of the current board computed from scratch.
+        '''
+        value = 0
+        for x in range(self.HEIGHT):
+            for y in range(self.WIDTH):
+                if self.grid[x][y] != 0: value ^= self.zobrist[x][y][self.grid[x][y]]
+        return value
+
+    def make_move(self, move: tuple, turn: int):
+
+        '''
+        Put a piece of turn on the board and update the hash and candidate moves.
+        '''
+        self.grid[move[0]][move[1]] = turn    # 1: turn to AI, 2: turn to opponent
+        self.hash ^= self.zobrist[move[0]][move[1]][turn]
+        self.candidates.add(move)
+
+    def unmake_move(self, move: tuple, turn: int):
+
+        '''
+        Take back the piece of turn from the board and restore the hash and candidate moves.
+        '''
+        self.grid[move[0]][move[1]] = 0
+        self.hash ^= self.zobrist[move[0]][move[1]][turn]
+        self.candidates.remove(move)
+
+    def is_free_move(self, x: int, y: int) -> bool:
+
+        '''
+        Check whether position (x, y) is available and free (with value 0).
+        '''
+        return 0 <= x < self.HEIGHT and 0 <= y < self.WIDTH and self.grid[x][y] == 0
+
+    def is_five_move(self, move: tuple, turn: int) -> bool:
+
+        '''
+        Check whether the move of turn makes five.
+        '''
+        self.grid[move[0]][move[1]] = turn
+        is_five = self.evaluator.is_win_move(move)
+        self.grid[move[0]][move[1]] = 0
+        return is_five
+
+    def is_stopped(self) -> bool:
+
+        '''
+        Check whether the search should stop: too many nodes or the time is up.
+        '''
+        if (self.max_nodes is not None and self.nodes >= self.max_nodes) or \
+           (self.time_manager is not None and self.time_manager.is_timeout()): self.is_aborted = True
+        return self.is_aborted
+
+
+class Minimax_with_Alpha_Beta_Pruning(Searcher):
+
+
+    def __init__(self, use_heuristic: bool = True, use_late_move_reduction: bool = False, use_futility_pruning: bool = False, use_quiescence: bool = False):
+
+        # board data, Zobrist hashing and limits of the search (only the time manager)
+        super().__init__()
+
+        # next moves: only the best forced move of the heuristic knowledge, or all surrounding moves (ordered)
+        # with the heuristic knowledge the search is a single line: the root returns its only move without searching,
+        # so iterative deepening, the transposition table, move ordering and the selective search need use_heuristic = False
+        self.use_heuristic = use_heuristic
+
+        # selective search for quiet moves (neither making nor blocking a three or four by the heuristic score),
+        # off by default: switches to compare the strength of the selective search
+        self.use_late_move_reduction = use_late_move_reduction    # late quiet moves are searched one ply shallower first
+        self.use_futility_pruning = use_futility_pruning    # quiet moves above the leaves are skipped if they can't reach the window
+        self.QUIET_SCORE = 600    # heuristic score of a move below which it is quiet
+        self.LATE_MOVES = 4    # number of moves searched at full depth before reductions
+        self.FUTILITY_MARGIN = 5000    # maximum gain of the static evaluation by one quiet move
+
+        # threat quiescence search at the leaves: only forcing moves (fives, fours and blocks of open fours) are extended,
+        # found from the windows of five kept in step with the moves; off by default: a switch to compare the strength
+        self.use_quiescence = use_quiescence
+        self.QUIESCENCE_DEPTH = 8    # maximum number of extended moves
+        self.QUIESCENCE_NODES = 200    # maximum number of nodes of the quiescence search at one leaf
+        self.quiescence_nodes = 0
+        self.threat_windows = None    # an instance of class Threat_Windows while searching with quiescence
+        self.WIN_SCORE = 10 ** 10    # score of a five, above any static evaluation
+
+        # evaluator for score
+        self.old_evaluator = Old_Evaluator()
+        self.evaluator = Evaluator()
+
+        # store the result
+        self.best_move = None
+
+        # transposition table: slot hash % TABLE_SIZE -> (hash, depth, flag, value, best move, generation)
+        self.TABLE_SIZE = 1 << 20
+        self.EXACT, self.LOWER, self.UPPER = 0, 1, 2    # bound types of the stored value
+        self.transposition_table = [None] * self.TABLE_SIZE
+        self.generation = 0    # entries of older searches are always replaced
+
+        # move ordering: principal variation of the last iteration, killer moves per ply and history table per turn
+        self.principal_variation = []    # [(x, y)] from the root
+        self.path = []    # moves from the root to the current node
+        self.killer_moves = []    # two moves causing cutoffs for each ply: [[(x, y), (x, y)]]
+        self.history = [None, [[0] * self.WIDTH for x in range(self.HEIGHT)], [[0] * self.WIDTH for x in range(self.HEIGHT)]]
+
+        # aspiration windows at the root: half width around the value of the last iteration
+        self.ASPIRATION_WINDOW = 10000
+
+        # constant data
+        self.INF = float('inf')
+
+    def probe_table(self):
+
+        '''
+        Return the entry of the current board in the transposition table, None if missing.
+        '''
+        entry = self.transposition_table[self.hash % self.TABLE_SIZE]
+        return entry if entry is not None and entry[0] == self.hash else None
+
+    def store_table(self, depth: int, flag: int, value: int, best_move: tuple):
+
+        '''
+        Store the result of the current board in the transposition table.
+        Replacement policy: keep the deeper entry of the current search, always replace entries of older searches.
+        '''
+        index = self.hash % self.TABLE_SIZE
+        entry = self.transposition_table[index]
+        if entry is None or entry[5] != self.generation or entry[0] == self.hash or entry[1] <= depth:
+            self.transposition_table[index] = (self.hash, depth, flag, value, best_move, self.generation)
+
+    def DFS(self, depth, turn, alpha, beta) -> int:
+
+        '''
+        Use Depth First Search to search the Minimax Tree.
+        '''
+
+        # stop the search when the time is up
+        if self.is_stopped(): return 0
+        self.nodes += 1
+
+        # look up the transposition table
+        alpha_origin, beta_origin = alpha, beta
+        table_move = None
+        entry = self.probe_table()
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth and depth != self.depth:    # never cut off at the root: the root needs its best move
+                if entry[2] == self.EXACT: return entry[3]
+                elif entry[2] == self.LOWER: alpha = max(alpha, entry[3])
+                else: beta = min(beta, entry[3])
+                if alpha >= beta: return entry[3]
+
+        # score of leaf node 
+        if depth == 1:
+            if not self.use_quiescence:
+                value = self.old_evaluator.get_score()    # incremental score of self.grid
+                self.store_table(depth, self.EXACT, value, None)
+                return value
+            self.quiescence_nodes = 0
+            value = self.quiescence(turn, alpha, beta, self.QUIESCENCE_DEPTH)    # resolve the pending threats
+            if self.is_aborted: return 0    # the result is incomplete
+            if value <= alpha_origin: flag = self.UPPER
+            elif value >= beta_origin: flag = self.LOWER
+            else: flag = self.EXACT
+            self.store_table(depth, flag, value, None)
+            return value
+
+        # order the moves: the best move stored in the transposition table first
+        ply = self.depth - depth    # distance from the root
+        next_moves = self.order_moves(turn, table_move, ply)    # lazy: later stages are generated only without a cutoff
+
+        # static evaluation for futility pruning above the leaves
+        static_value = self.old_evaluator.get_score() if self.use_futility_pruning and depth == 2 else None
+        
+        # traverse all child nodes with alpha-beta pruning
+        best_move = None
+        for i, ((x, y), score) in enumerate(next_moves):
+            is_quiet = i > 0 and score is not None and score < self.QUIET_SCORE and (x, y) not in self.killer_moves[ply]
+
+            # futility pruning: a quiet move can't bring the leaf value into the window
+            if is_quiet and static_value is not None:
+                if turn == 1 and static_value + self.FUTILITY_MARGIN <= alpha: continue
+                if turn == 2 and static_value - self.FUTILITY_MARGIN >= beta: continue
+
+            # late move reduction: a late quiet move is searched one ply shallower first
+            reduction = 1 if self.use_late_move_reduction and is_quiet and i >= self.LATE_MOVES and depth >= 3 else 0
+
+            # a five ends the game: scored without searching further, a sooner win (more depth left) scores higher
+            if self.is_five_move((x, y), turn): value = self.WIN_SCORE + depth if turn == 1 else -self.WIN_SCORE - depth
+
+            # recursion by DFS: Principal Variation Search, the first move with the full window and others with a null window
+            else:
+                self.make_move((x, y), turn)
+                self.path.append((x, y))
+                if i == 0:
+                    value = self.DFS(depth = depth - 1, turn = 3 - turn, alpha = alpha, beta = beta)
+                else:
+                    if turn == 1: value = self.DFS(depth = depth - 1 - reduction, turn = 3 - turn, alpha = alpha, beta = alpha + 1)
+                    else: value = self.DFS(depth = depth - 1 - reduction, turn = 3 - turn, alpha = beta - 1, beta = beta)
+                    if reduction and (value > alpha if turn == 1 else value < beta) and not self.is_aborted:    # the reduced search fails high
+                        if turn == 1: value = self.DFS(depth = depth - 1, turn = 3 - turn, alpha = alpha, beta = alpha + 1)
+                        else: value = self.DFS(depth = depth - 1, turn = 3 - turn, alpha = beta - 1, beta = beta)
+                    if alpha < value < beta and not self.is_aborted:    # the null window fails: search again with the full window
+                        value = self.DFS(depth = depth - 1, turn = 3 - turn, alpha = alpha, beta = beta)
+                self.path.pop()
+                self.unmake_move((x, y), turn)
+                if self.is_aborted: return 0    # the result is incomplete
+
+            # MAX node    
+            if turn == 1:
+                best_move = (x, y) if alpha < value or best_move is None else best_move
+                alpha = max(alpha, value)
+
+            # MIN node
+            else:
+                best_move = (x, y) if beta > value or best_move is None else best_move
+                beta = min(beta, value)
+            
+            # pruning: remember the move in the killer moves and the history table
+            if alpha >= beta:
+                killer_moves = self.killer_moves[ply]
+                if killer_moves[0] != (x, y): killer_moves[1] = killer_moves[0]; killer_moves[0] = (x, y)
+                self.history[turn][x][y] += depth * depth
+                break
+
+        # store the result: MAX node returns alpha, MIN node returns beta
+        value = alpha if turn == 1 else beta
+        if value <= alpha_origin: flag = self.UPPER
+        elif value >= beta_origin: flag = self.LOWER
+        else: flag = self.EXACT
+        self.store_table(depth, flag, value, best_move)
+
+        # the best move of the root
+        if depth == self.depth: self.best_move = best_move
+
+        return value
+
+    def quiescence(self, turn, alpha, beta, depth) -> int:
+
+        '''
+        Search only forcing moves beyond the leaves: make or block five, make a four or block an open four.
+        The side to move may stand pat on the static evaluation unless it must block a four.
+        '''
+
+        # stop the search when the time is up
+        if self.is_stopped(): return 0
+        self.nodes += 1
+        self.quiescence_nodes += 1
+
+        # forcing moves of both turns from the threat windows
+        five_moves, four_moves = self.threat_windows.get_threat_moves(self.grid, turn)
+        block_moves, opponent_four_moves = self.threat_windows.get_threat_moves(self.grid, 3 - turn)
+        four_moves = [move for move in four_moves if move not in five_moves]
+        three_blocks = [move for move, fives in opponent_four_moves.items() if len(fives) >= 2 and move not in block_moves]    # open four of the opponent
+
+        # five at once, or two fours of the opponent
+        if five_moves: value = self.WIN_SCORE if turn == 1 else -self.WIN_SCORE
+        elif len(block_moves) >= 2: value = -self.WIN_SCORE if turn == 1 else self.WIN_SCORE
+        else: value = None
+        if value is not None: return max(alpha, min(beta, value))    # fail-hard as self.DFS()
+
+        # limits of the quiescence search
+        value = self.old_evaluator.get_score()
+        if depth == 0 or self.quiescence_nodes >= self.QUIESCENCE_NODES: return max(alpha, min(beta, value))
+
+        # stand pat: the static evaluation, not allowed if a four must be blocked
+        if block_moves: next_moves = block_moves
+        else:
+            if turn == 1: alpha = max(alpha, value)
+            else: beta = min(beta, value)
+            if alpha >= beta: return alpha if turn == 1 else beta
+            next_moves = four_moves + [move for move in three_blocks if move not in four_moves]
+
+        # extend the forcing moves
+        for x, y in next_moves:
+            self.make_move((x, y), turn)
+            value = self.quiescence(3 - turn, alpha, beta, depth - 1)
+            self.unmake_move((x, y), turn)
+            if self.is_aborted: return 0    # the result is incomplete
+            if turn == 1: alpha = max(alpha, value)
+            else: beta = min(beta, value)
+            if alpha >= beta: break
+
+        return alpha if turn == 1 else beta
+
+    def order_moves(self, turn: int, table_move: tuple, ply: int):
+
+        '''
+        Yield the next moves in the order of search with their heuristic scores (None if not scored).
+        Order: the move of the transposition table, the move of the principal variation, killer moves,
+        then the staged moves of the evaluator, whose last stage is sorted by the history table and heuristic knowledge.
+        '''
+
+        # only the best forced move of the heuristic knowledge
+        if self.use_heuristic:
+            for move in self.get_next_moves(turn, use_heuristic = True): yield move, None
+            return
+
+        # moves tried first
+        first_moves = [table_move]
+        if ply < len(self.principal_variation) and self.path == self.principal_variation[:ply]: first_moves.append(self.principal_variation[ply])
+        if ply < len(self.killer_moves): first_moves.extend(self.killer_moves[ply])
+        tried_moves = set()
+        for move in first_moves:
+            if move is not None and move not in tried_moves and move in self.candidates.moves:
+                tried_moves.add(move)
+                yield move, None
+
+        # staged moves of the evaluator
+        board = Board(self.grid, turn, candidates = self.candidates)
+        for move, score in self.evaluator.generate_staged_moves(board, self.history[turn]):
+            if move not in tried_moves: yield move, score
+
+    def get_principal_variation(self, depth: int) -> list:
+
+        '''
+        Return the principal variation from the root by following the best moves in the transposition table.
+        '''
+        variation, turn = [], 1
+        while len(variation) < depth:
+            entry = self.probe_table()
+            if entry is None or entry[4] is None or not self.is_free_move(*entry[4]): break
+            variation.append(entry[4])
+            self.make_move(entry[4], turn)
+            turn = 3 - turn
+        for x, y in reversed(variation):
+            turn = 3 - turn
+            self.unmake_move((x, y), turn)
+        return variation
+
+    def make_move(self, move: tuple, turn: int):
+
+        '''
+        Put a piece on the board and update the hash, candidate moves, incremental score and threat windows.
+        '''
+        super().make_move(move, turn)
+        self.old_evaluator.make_move(move[0], move[1], turn)
+        if self.threat_windows is not None: self.threat_windows.add(move, turn)
+
+    def unmake_move(self, move: tuple, turn: int):
+
+        '''
+        Take back a piece from the board and restore the hash, candidate moves, incremental score and threat windows.
+        '''
+        super().unmake_move(move, turn)
+        self.old_evaluator.unmake_move(move[0], move[1], turn)
+        if self.threat_windows is not None: self.threat_windows.remove(move, turn)
+
+    def get_next_moves(self, turn, use_heuristic = True) -> list:
+        
+        '''
+        Return a list of next moves as children of the root in Minimax Tree.
+        '''
+
+        #####################################################
+        ### First strategy: Search for FORCED moves       ###
+        ### Second strategy: Search for SURROUNDING moves ###
+        #####################################################
+
+        ### First strategy: Use heuristic knowledge to search FORCED moves
+        if use_heuristic:
+            best_forced_move = self.evaluator.get_next_moves(Board(self.grid, turn, candidates = self.candidates), use_heuristic = True)    # 1: turn to AI, 2: turn to opponent
+            return best_forced_move
+
+        ### Second strategy: Expand SURROUNDING positions in the range of three
+        return list(self.candidates.moves)    # incrementally maintained frontier
+
+    def get_best_move(self, board, depth = 5, time_manager = None) -> tuple:
+
+        '''
+        Return the best move (x, y) with Minimax.
+        Search by iterative deepening up to the given depth: the principal variation of each iteration orders the next one,
+        and the root uses aspiration windows around the last value.
+        The search stops early for a single or forced move at the root (always the case with use_heuristic),
+        and once a forced win or loss is found.
+        With a time manager, return the move of the deepest completed search.
+        '''
+        self.set_grid(board)
+        self.old_evaluator.set_board(self.grid)
+        self.threat_windows = Threat_Windows(self.HEIGHT, self.WIDTH, self.grid) if self.use_quiescence else None
+        self.generation += 1
+        self.time_manager = time_manager
+        self.is_aborted = False
+
+        # move ordering data of this search
+        self.principal_variation, self.path = [], []
+        self.killer_moves = [[None, None] for ply in range(depth + 1)]
+        self.history = [None, [[0] * self.WIDTH for x in range(self.HEIGHT)], [[0] * self.WIDTH for x in range(self.HEIGHT)]]
+        self.nodes = 0
+
+        # a single or forced move at the root needs no search: the only move, a five, or the only block of a five
+        root_moves = self.get_next_moves(1, self.use_heuristic)
+        if len(root_moves) == 1: return root_moves[0]
+        five_moves = [move for move in root_moves if self.is_five_move(move, 1)]
+        if five_moves: return five_moves[0]
+        block_moves = [move for move in root_moves if self.is_five_move(move, 2)]
+        if len(block_moves) == 1: return block_moves[0]
+
+        # iterative deepening
+        best_move, value = None, None
+        for current_depth in range(min(2, depth), depth + 1):
+            self.depth = current_depth    # depth of the root
+
+            # aspiration window around the value of the last iteration, widened to the full window if the value falls outside
+            alpha, beta = (-self.INF, self.INF) if value is None else (value - self.ASPIRATION_WINDOW, value + self.ASPIRATION_WINDOW)
+            while True:
+                value = self.DFS(depth = current_depth, turn = 1, alpha = alpha, beta = beta)
+                if self.is_aborted or alpha < value < beta: break
+                if value <= alpha: alpha = -self.INF    # fail low
+                if value >= beta: beta = self.INF    # fail high
+
+            if self.is_aborted: break    # keep the move of the last completed search
+            best_move = self.best_move
+            self.principal_variation = self.get_principal_variation(current_depth)
+            if abs(value) >= self.WIN_SCORE: break    # a forced win or loss: deeper searches can't change the result
+            if time_manager is not None and time_manager.is_timeout(): break
+
+        # no search completed: the first candidate move
+        if best_move is None: best_move = self.get_next_moves(1)[0]
+        return best_move
+
+
+class Threat_Space_Search(Searcher):
+
+    def __init__(self, max_nodes: int = 2000, use_vct: bool = False):
+
+        # board data, Zobrist hashing and limits of the search
+        super().__init__(max_nodes)
+
+        # evaluator for wins and threats
+        self.evaluator = Evaluator()
+
+        # victory by continuous threes: slower, only used if enabled
+        self.use_vct = use_vct
+        self.VCF_DEPTH = 12    # maximum number of fours in a sequence
+        self.VCT_DEPTH = 3    # maximum number of threes in a sequence
+
+        # transposition cache of the searched positions: (kind, hash, attacker, forced move) -> (depth, first move of the victory or None)
+        # a victory is reused at any depth, a failure only with no more depth left than when it was searched
+        self.cache = {}
+
+    def get_four_moves(self, turn: int, forced_move: tuple = None) -> list:
+
+        '''
+        Return moves of turn making five or four, fives first, only the forced move if the opponent has a four.
+        '''
+        five_moves, four_moves = [], []
+        for move in ([forced_move] if forced_move is not None else self.candidates.moves):
+            self.grid[move[0]][move[1]] = turn
+            if self.evaluator.is_win_move(move): five_moves.append(move)
+            elif self.evaluator.get_threat_moves(self.grid, move, turn): four_moves.append(move)
+            self.grid[move[0]][move[1]] = 0
+        return five_moves + four_moves
+
+    def search_vcf(self, attacker: int, depth: int, forced_move: tuple = None) -> tuple:
+
+        '''
+        Return the first move of a victory by continuous fours for attacker to move, None if not found.
+        The forced move is the position completing the four of the defender, which must be blocked first.
+        '''
+        key = ('VCF', self.hash, attacker, forced_move)
+        entry = self.cache.get(key)
+        if entry is not None and (entry[1] is not None or entry[0] >= depth): return entry[1]
+        if depth == 0 or self.is_stopped(): return None
+        self.nodes += 1
+
+        defender, best_move = 3 - attacker, None
+        for move in self.get_four_moves(attacker, forced_move):
+
+            # five: win at once
+            self.make_move(move, attacker)
+            if self.evaluator.is_win_move(move): best_move = move
+            else:
+
+                # four: the defender must block, open four or double four wins
+                five_moves = self.evaluator.get_threat_moves(self.grid, move, attacker)
+                if len(five_moves) >= 2: best_move = move
+                elif len(five_moves) == 1:
+                    block = five_moves[0]
+                    self.make_move(block, defender)
+                    if not self.evaluator.is_win_move(block):    # the block doesn't make five for the defender
+                        counter_moves = self.evaluator.get_threat_moves(self.grid, block, defender)    # the block makes a four
+                        if len(counter_moves) <= 1 and self.search_vcf(attacker, depth - 1, counter_moves[0] if counter_moves else None):
+                            best_move = move
+                    self.unmake_move(block, defender)
+
+            self.unmake_move(move, attacker)
+            if best_move is not None or self.is_aborted: break
+
+        if not self.is_aborted: self.cache[key] = (depth, best_move)    # unfinished results are not stored
+        return best_move
+
+    def get_three_moves(self, turn: int, forced_move: tuple = None) -> list:
+
+        '''
+        Return moves of turn making a three which wins by continuous fours if the opponent doesn't answer.
+        '''
+        three_moves = []
+        for move in ([forced_move] if forced_move is not None else list(self.candidates.moves)):
+            self.grid[move[0]][move[1]] = turn
+            is_three = len(self.evaluator.get_threat_moves(self.grid, move, turn, pieces = 3)) >= 2
+            self.grid[move[0]][move[1]] = 0
+            if not is_three: continue
+            self.make_move(move, turn)
+            if self.search_vcf(turn, 2) is not None: three_moves.append(move)    # null move: turn plays again
+            self.unmake_move(move, turn)
+            if self.is_aborted: break
+        return three_moves
+
+    def search_vct(self, attacker: int, depth: int, forced_move: tuple = None) -> tuple:
+
+        '''
+        Return the first move of a victory by continuous threes (and fours) for attacker to move, None if not found.
+        The defender may answer a three on its lines or with any four of its own.
+        '''
+        best_move = self.search_vcf(attacker, self.VCF_DEPTH, forced_move)
+        if best_move is not None or depth == 0 or self.is_aborted: return best_move
+        key = ('VCT', self.hash, attacker, forced_move)
+        entry = self.cache.get(key)
+        if entry is not None and (entry[1] is not None or entry[0] >= depth): return entry[1]
+        self.nodes += 1
+
+        defender = 3 - attacker
+        for move in self.get_three_moves(attacker, forced_move):
+            self.make_move(move, attacker)
+
+            # answers of the defender: free positions on the lines of the three, and fours of the defender
+            defence_moves = set(self.evaluator.get_threat_moves(self.grid, move, attacker, pieces = 3))
+            defence_moves.update(self.evaluator.get_threat_moves(self.grid, move, attacker, pieces = 4))
+            defence_moves.update(self.get_four_moves(defender))
+
+            # the attacker must win against every answer
+            is_win = True
+            for defence in defence_moves:
+                self.make_move(defence, defender)
+                if self.evaluator.is_win_move(defence): is_win = False
+                else:
+                    counter_moves = self.evaluator.get_threat_moves(self.grid, defence, defender)
+                    if len(counter_moves) > 1 or self.search_vct(attacker, depth - 1, counter_moves[0] if counter_moves else None) is None:
+                        is_win = False
+                self.unmake_move(defence, defender)
+                if not is_win or self.is_aborted: break
+
+            self.unmake_move(move, attacker)
+            if is_win and not self.is_aborted: best_move = move
+            if best_move is not None or self.is_aborted: break
+
+        if not self.is_aborted: self.cache[key] = (depth, best_move)    # unfinished results are not stored
+        return best_move
+
+    def get_best_move(self, board: list, turn: int, time_manager = None) -> tuple:
+
+        '''
+        Return a forced move for turn: the first move of our victory by continuous fours (or threes),
+        otherwise the first move of the opponent's victory by continuous fours if taking it refutes that victory,
+        None if neither is found.
+        '''
+
+        # initialize the board data
+        self.set_grid([row[:self.WIDTH] for row in board[:self.HEIGHT]])
+        self.time_manager, self.nodes, self.is_aborted = time_manager, 0, False
+
+        # five at once, or block the four of the opponent
+        for player in (turn, 3 - turn):
+            for move in self.candidates.moves:
+                if self.is_five_move(move, player): return move
+
+        # our victory
+        best_move = self.search_vct(turn, self.VCT_DEPTH) if self.use_vct else self.search_vcf(turn, self.VCF_DEPTH)
+        if best_move is not None: return best_move
+
+        # the opponent's victory if it could move: its first move is only played if the victory is gone afterwards
+        self.nodes, self.is_aborted = 0, False
+        threat_move = self.search_vcf(3 - turn, self.VCF_DEPTH)
+        if threat_move is None or self.is_aborted: return None
+        self.nodes = 0
+        self.make_move(threat_move, turn)
+        is_refuted = self.search_vcf(3 - turn, self.VCF_DEPTH) is None and not self.is_aborted
+        self.unmake_move(threat_move, turn)
+        return threat_move if is_refuted else None
+
+
+class Proof_Number_Search(Searcher):
+
+    def __init__(self, max_nodes: int = 100000, table_size: int = 1 << 18):
+
+        # board data, Zobrist hashing and limits of the search
+        super().__init__(max_nodes)
+
+        # evaluator for move generation and terminal detection
+        self.evaluator = Evaluator()
+
+        # bounded hash table: slot hash % TABLE_SIZE -> (hash, phi, delta), always replaced
+        self.TABLE_SIZE = table_size
+        self.table = [None] * self.TABLE_SIZE
+
+        # constant data: phi and delta of proven nodes
+        self.INF = 1 << 30
+
+    def probe_table(self, value: int) -> tuple:
+
+        '''
+        Return (phi, delta) of the board with hash value, (1, 1) for a new board.
+        phi: proof number for the player to move, delta: disproof number.
+        '''
+        entry = self.table[value % self.TABLE_SIZE]
+        return (entry[1], entry[2]) if entry is not None and entry[0] == value else (1, 1)
+
+    def store_table(self, phi: int, delta: int):
+
+        '''
+        Store (phi, delta) of the current board in the hash table.
+        '''
+        self.table[self.hash % self.TABLE_SIZE] = (self.hash, phi, delta)
+
+    def get_next_moves(self, turn: int) -> tuple:
+
+        '''
+        Return (state, moves) of the current board for turn to move.
+        State 1: a five at once, -1: the opponent has two fours to block, 0: unknown.
+        Only the block is returned if the opponent has a four, which keeps the proof sound.
+        '''
+        next_moves = self.evaluator.get_surrounding_moves()
+        center = ((self.HEIGHT - 1) // 2, (self.WIDTH - 1) // 2)
+        if next_moves == [] and self.grid[center[0]][center[1]] == 0: next_moves = [center]    # choice for first round: center position of the board
+        for move in next_moves:
+            if self.is_five_move(move, turn): return 1, [move]
+        block_moves = [move for move in next_moves if self.is_five_move(move, 3 - turn)]
+        if len(block_moves) > 1: return -1, []
+        return 0, block_moves or next_moves
+
+    def MID(self, turn: int, phi_threshold: int, delta_threshold: int):
+
+        '''
+        Multiple iterative deepening of df-pn: search the current board until phi or delta reaches its threshold.
+        '''
+        if self.is_stopped(): return
+        self.nodes += 1
+
+        # terminal board: win at once, lost, or draw (a loss for the attacker)
+        state, next_moves = self.get_next_moves(turn)
+        if state == 1: self.store_table(0, self.INF); return
+        if state == -1: self.store_table(self.INF, 0); return
+        if next_moves == []:
+            self.store_table(*((self.INF, 0) if turn == self.attacker else (0, self.INF)))
+            return
+
+        while True:
+
+            # phi: minimum delta of children, delta: sum of phi of children
+            phi, delta = self.INF, 0
+            best_move, best_phi, second_delta = None, 0, self.INF
+            for move in next_moves:
+                child_phi, child_delta = self.probe_table(self.hash ^ self.zobrist[move[0]][move[1]][turn])
+                delta = min(self.INF, delta + child_phi)
+                if child_delta < phi: second_delta = phi; phi = child_delta; best_move, best_phi = move, child_phi
+                elif child_delta < second_delta: second_delta = child_delta
+            self.store_table(phi, delta)
+            if phi >= phi_threshold or delta >= delta_threshold or self.is_aborted: return
+
+            # search the most proving child with new thresholds
+            self.make_move(best_move, turn)
+            self.MID(3 - turn, delta_threshold + best_phi - delta, min(phi_threshold, second_delta + 1))
+            self.unmake_move(best_move, turn)
+
+    def solve(self, board, time_manager = None) -> tuple:
+
+        '''
+        Prove the given board for the player to move with df-pn.
+        Return (result, best move, number of nodes, time in seconds), result 1: proven win, -1: proven loss, 0: unknown.
+        '''
+
+        # initialize the board data
+        start_time = time.time()
+        self.set_grid([row[:self.WIDTH] for row in board.grid[:self.HEIGHT]])
+        self.attacker = board.turn    # the player to prove a win for
+        self.time_manager, self.nodes, self.is_aborted = time_manager, 0, False
+
+        # search until the board is proven or a limit is reached
+        self.MID(board.turn, self.INF, self.INF)
+        phi, delta = self.probe_table(self.hash)
+        result = 1 if phi == 0 else -1 if delta == 0 else 0
+
+        # best move: the child with minimum delta (a proven loss for the opponent if the board is proven)
+        best_move = None
+        next_moves = self.get_next_moves(board.turn)[1]
+        if next_moves:
+            best_move = min(next_moves, key = lambda x: self.probe_table(self.hash ^ self.zobrist[x[0]][x[1]][board.turn])[1])
+
+        return result, best_move, self.nodes, time.time() - start_time
+
+
+class Playout_Engine():
+
+    # positions whose heuristic score depends on each position, shared by engines of the same board size: {(HEIGHT, WIDTH): list}
+    PATTERN_NEIGHBOURS = {}
+
+    def __init__(self, policy: str = 'heuristic', max_depth: int = None):
+
+        # evaluator for moves and wins
+        self.evaluator = Evaluator()
+        self.HEIGHT = self.evaluator.HEIGHT
+        self.WIDTH = self.evaluator.WIDTH
+
+        # policy of playouts: 'heuristic' (best move of the heuristic knowledge), 'random' (random surrounding move)
+        # or 'light' (win or block a four through the last moves, otherwise random surrounding move)
+        self.policy = policy
+
+        # truncated playouts: stop after max_depth moves and judge the board by Old_Evaluator, None to play to the end
+        self.max_depth = max_depth
+        self.old_evaluator = Old_Evaluator() if max_depth is not None else None
+
+        # kinds of positions on the padded board for each turn, kept in step with the moves of a playout
+        self.states = None
+
+        # heuristic scores of the candidate moves for each turn, kept between the moves of a playout:
+        # a move is scored again only when a piece is put within five positions on its lines (the range of its patterns)
+        self.scores = None    # [None, {(x, y): score}, {(x, y): score}]
+        self.dirty_moves = None    # moves to score again for each turn: [None, {(x, y)}, {(x, y)}]
+        if (self.HEIGHT, self.WIDTH) not in Playout_Engine.PATTERN_NEIGHBOURS:
+            Playout_Engine.PATTERN_NEIGHBOURS[(self.HEIGHT, self.WIDTH)] = [
+                [
+                    (x + i * dx, y + i * dy)
+                    for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1))
+                    for i in (-5, -4, -3, -2, -1, 1, 2, 3, 4, 5)
+                    if 0 <= x + i * dx < self.HEIGHT and 0 <= y + i * dy < self.WIDTH
+                ]
+                for x in range(self.HEIGHT) for y in range(self.WIDTH)
+            ]
+        self.pattern_neighbours = Playout_Engine.PATTERN_NEIGHBOURS[(self.HEIGHT, self.WIDTH)]
+
+    def set_states(self, grid: list):
+
+        '''
+        Store the kinds of positions of the given grid for both turns, None if the grid has blocks.
+        With numpy, the kinds are kept in arrays: self.evaluator.search_forced_moves_batched() uses them without a copy.
+        '''
+        self.evaluator.grid = grid
+        self.states = [None, None, None]
+        for turn in (1, 2):
+            self.evaluator.turn = turn
+            self.evaluator.set_pattern_states()
+            if self.evaluator.states is None: self.states = None; return    # blocked position
+            self.states[turn] = numpy.array(self.evaluator.states, dtype = numpy.int32) if numpy is not None else self.evaluator.states
+
+    def update_states(self, move: tuple, turn: int):
+
+        '''
+        Update the kinds of position move = (x, y) for both turns: turn 0 removes the piece.
+        '''
+        index = (move[0] + 5) * self.evaluator.PADDED_WIDTH + move[1] + 5
+        self.states[1][index] = (1, 2, 3)[turn]    # 1: null, 2: AI, 3: opponent in the view of turn 1
+        self.states[2][index] = (1, 3, 2)[turn]    # 1: null, 2: AI, 3: opponent in the view of turn 2
+
+    def update_scores(self, move: tuple):
+
+        '''
+        Drop the score of move = (x, y) and mark the moves whose patterns see it to be scored again for both turns.
+        '''
+        neighbours = self.pattern_neighbours[move[0] * self.WIDTH + move[1]]
+        for turn in (1, 2):
+            self.scores[turn].pop(move, None)
+            self.dirty_moves[turn].update(neighbours)
+
+    def get_move(self, grid: list, turn: int, candidates, last_moves: list = None) -> tuple:
+
+        '''
+        Return the next move of the playout by the policy.
+        The light policy only looks for fours through the last moves: [..., (x, y) of turn, (x, y) of the opponent].
+        '''
+
+        # no surrounding moves: the center or the first free position
+        if not candidates.moves:
+            x, y = (self.HEIGHT - 1) // 2, (self.WIDTH - 1) // 2
+            if grid[x][y] == 0: return x, y
+            return next((x, y) for x in range(self.HEIGHT) for y in range(self.WIDTH) if grid[x][y] == 0)
+
+        # random policy
+        if self.policy == 'random': return random.choice(list(candidates.moves))
+
+        # light policy: complete our four, block the four of the opponent, or a random surrounding move
+        if self.policy == 'light':
+            if last_moves:
+                for move, player in ((last_moves[-2:-1], turn), (last_moves[-1:], 3 - turn)):
+                    if move: move = self.evaluator.get_threat_moves(grid, move[0], player)
+                    if move: return move[0]
+            return random.choice(list(candidates.moves))
+
+        # heuristic policy: the same best move as Evaluator.get_heuristic_moves(), only the moves near the last moves are scored again
+        evaluator = self.evaluator
+        evaluator.turn = turn
+        evaluator.states = self.states[turn] if self.states is not None else None
+        evaluator.heuristic_moves = collections.defaultdict(int)
+        evaluator.search_forced_moves_batched(list(self.dirty_moves[turn] & candidates.moves))
+        scores = self.scores[turn]
+        scores.update(evaluator.heuristic_moves)
+        self.dirty_moves[turn] = set()
+        return max(scores, key = scores.get)
+
+    def run(self, board, played_moves: list = None) -> int:
+
+        '''
+        Return the winner of a playout from the given board: 0: draw, 1: AI, 2: opponent.
+        Moves are made in place on the grid of the board and taken back when the playout ends.
+        If a list is given, the moves of the playout are appended to it as ((x, y), turn).
+        '''
+
+        # terminal board
+        if board.is_terminal:
+            if board.is_terminal == -1: return 0    # 0: draw
+            return 3 - board.turn    # the player who moved last has five
+
+        # initialize the playout data
+        grid = board.grid
+        candidates = board.candidates if board.candidates is not None else Candidates(self.HEIGHT, self.WIDTH, grid)
+        pieces = board.pieces if board.pieces is not None else self.evaluator.count_pieces(grid)
+        if self.policy == 'heuristic':
+            self.set_states(grid)
+            self.scores, self.dirty_moves = [None, {}, {}], [None, set(candidates.moves), set(candidates.moves)]
+        self.evaluator.grid = grid
+        turn, winner, moves = board.turn, 0, []
+        last_moves = [board.move] if board.move is not None else []    # last moves for the light policy
+
+        # make moves until the game ends
+        while True:
+
+            # depth cutoff: the side with the better static evaluation wins
+            if self.max_depth is not None and len(moves) >= self.max_depth:
+                value = self.old_evaluator.get_board_value_vectorized(grid)    # positive: better for AI
+                winner = 1 if value > 0 else 2 if value < 0 else 0
+                break
+
+            move = self.get_move(grid, turn, candidates, moves if len(moves) >= 2 else last_moves + moves)
+            grid[move[0]][move[1]] = turn
+            candidates.add(move)
+            if self.policy == 'heuristic':
+                if self.states is not None: self.update_states(move, turn)
+                self.update_scores(move)
+            moves.append(move)
+            if played_moves is not None: played_moves.append((move, turn))
+            pieces += 1
+            if self.evaluator.is_win_move(move): winner = turn; break    # only the lines through the last move
+            if pieces == self.HEIGHT * self.WIDTH: break    # draw
+            turn = 3 - turn
+
+        # take back all moves of the playout
+        for move in reversed(moves):
+            grid[move[0]][move[1]] = 0
+            candidates.remove(move)
+
+        return winner    # 0: draw, 1: AI, 2: opponent
+
+    def benchmark(self, board, seconds: float = 1.0) -> float:
+
+        '''
+        Return the number of playouts per second from the given board.
+        '''
+        playouts, start_time = 0, time.time()
+        while playouts == 0 or time.time() - start_time < seconds:
+            self.run(board)
+            playouts += 1
+        return playouts / (time.time() - start_time)
+
+
+class MCTS():
+
+    def __init__(self, sample_size: int, use_rave: bool = False):
+
+        self.evaluator = Evaluator()    # evaluator for the current board
+        self.playout_engine = Playout_Engine()    # copy-free playouts for simulation, replace it to change the rollout mode
+        self.sample_size = sample_size    # total times to run MCTS
+        self.confidence_level = 1.96    # confidence level of the UCT
+        self.widening_constant = 1.0    # progressive widening: a node with n visits opens at most C * (n + 1) ^ alpha children
+        self.widening_exponent = 0.5
+        # RAVE: blend the all-moves-as-first statistics into the UCT, off by default: in self-play at 100 samples it won 3 of 8 games
+        # against the plain UCT and 1 of 6 against the heuristic player at 60 samples, since a gomoku move is worth little out of its order
+        self.use_rave = use_rave
+        self.rave_equivalence = 1000    # visit times of a child at which its own and RAVE statistics weigh 3 : 1
+        self.playout_moves = []    # moves of the last playout: [((x, y), turn)], only recorded with RAVE
+        self.root = None    # the root of Monte Carlo Tree, kept between searches
+
+        # scratch board shared by all nodes: the position of the root, moves on the selection path are made and taken back
+        self.grid = None    # a 2-dimension list of the root position, None if there is no tree
+        self.candidates = None    # an instance of class Candidates for the scratch board
+        self.pieces = 0    # the number of pieces of the root position
+        self.turn = None    # 1: turn to AI, 2: turn to opponent on the scratch board
+        self.moves = []    # moves made on the scratch board since the root
+
+    def advance(self, move: tuple):
+
+        '''
+        Move the root down to the child with the given move, or drop the tree if the child hasn't been expanded.
+        '''
+        if self.root is not None and move in self.root.children:
+            self.make_move(move)
+            self.moves = []    # the move belongs to the new root position
+            self.pieces += 1
+            self.root = self.root.children[move]
+            self.root.parent = None    # stop backpropagation at the new root
+        else:
+            self.reset()
+
+    def reset(self):
+
+        '''
+        Drop the Monte Carlo Tree.
+        '''
+        self.root, self.grid = None, None
+
+    def is_reusable(self, board) -> bool:
+
+        '''
+        Check whether the kept root stands for the given board.
+        '''
+        if self.root is None or self.grid is None or self.turn != board.turn: return False
+        grid = board.grid
+        return all(grid[x][:self.evaluator.WIDTH] == self.grid[x] for x in range(self.evaluator.HEIGHT))
+
+    # functions for the scratch board
+    def set_board(self, board):
+
+        '''
+        Set the scratch board to a copy of the given board.
+        '''
+        self.grid = [row[:self.evaluator.WIDTH] for row in board.grid[:self.evaluator.HEIGHT]]
+        self.candidates = Candidates(self.evaluator.HEIGHT, self.evaluator.WIDTH, self.grid)
+        self.pieces = self.evaluator.count_pieces(self.grid)
+        self.turn, self.moves = board.turn, []
+
+    def make_move(self, move: tuple):
+
+        '''
+        Put a piece of the current turn on the scratch board.
+        '''
+        self.grid[move[0]][move[1]] = self.turn
+        self.candidates.add(move)
+        self.moves.append(move)
+        self.turn = 3 - self.turn
+
+    def unmake_moves(self):
+
+        '''
+        Take back all moves made on the scratch board since the root.
+        '''
+        for move in reversed(self.moves):
+            self.grid[move[0]][move[1]] = 0
+            self.candidates.remove(move)
+            self.turn = 3 - self.turn
+        self.moves = []
+
+    def get_board(self):
+
+        '''
+        Return the scratch board as an instance of class Board (without copying the grid).
+        '''
+        last_move = self.moves[-1] if self.moves else None
+        return Board(grid = self.grid, turn = self.turn, move = last_move, pieces = self.pieces + len(self.moves), candidates = self.candidates)
+
+    def is_finished(self, samples: int, time_manager) -> bool:
+
+        '''
+        Check whether the search should stop: sample_size samples, or the time is up with a time manager (at least one sample).
+        '''
+        if time_manager is None: return samples >= self.sample_size
+        return samples > 0 and time_manager.is_timeout()
+
+    def search(self, board, time_manager = None) -> tuple:
+
+        '''
+        Use MCTS to search the best move for the given board.
+        With a time manager, sample until the time is up and return the best move so far.
+        '''
+
+        # search forced move
+        # forced_move = self.evaluator.get_next_moves(board = board, use_heuristic = True)
+        # if len(forced_move) == 1: return forced_move[0]
+
+        # construct the root of Monte Carlo Tree, or reuse the subtree kept by self.advance()
+        if not self.is_reusable(board):
+            self.set_board(board)
+            self.root = Node(None, board.turn, board.is_terminal, None)    # no parent
+
+        # play the game for sample_size times or until the time is up, or until the root is proven
+        samples = 0
+        while not self.root.proven and not self.is_finished(samples, time_manager):
+
+            # First Step: Selection & Second Step: Expansion
+            node = self.selection(self.root)    # select the node with higher possibility
+            if node.proven: self.solve(node)    # MCTS-Solver: propagate the proven result to the ancestors
+
+            # Third Step: Simulation
+            self.playout_moves = []
+            results, playouts = self.simulate_node(node)    # total results of the playouts from the node: [draws, AI wins, opponent wins]
+
+            # Fourth step: Backpropagation
+            self.backpropogation(node, results, playouts)    # update each node on the path
+            if self.use_rave: self.update_amaf(node, results, playouts)    # update moves played later on the path
+            self.unmake_moves()    # back to the root position
+            samples += playouts
+
+        # get the best move from the root node
+        return self.get_best_move(self.root)
+
+    def selection(self, node):
+
+        '''
+        Return the node selected by MCTS policy, with its position on the scratch board.
+        '''
+        while not node.is_leaf:
+            if not node.is_fully_expanded and (
+                len(node.children) < self.get_widening_limit(node) or all(child.proven for child in node.children.values())
+            ):
+                child = self.expansion(node)    # search in breadth (also when all opened children are proven)
+                if child is not None: return child
+
+                # the node has just been found fully expanded: proven if every move loses
+                if all(child.proven == 3 - node.turn for child in node.children.values()):
+                    node.proven = 3 - node.turn
+                    return node
+            node = self.get_best_child(node)    # search in depth
+            self.make_move(node.move)
+        return node    # get the leaf node
+
+    def get_widening_limit(self, node) -> float:
+
+        '''
+        Return the number of children the given node may open for its visit times (progressive widening).
+        '''
+        return self.widening_constant * (node.visit_times + 1) ** self.widening_exponent
+
+    def expansion(self, node):
+
+        '''
+        Return a new node for expansion in the Monte Carlo Tree, None if the node turns out to be fully expanded.
+        '''
+
+        # get next moves from the scratch board in the position of the node lazily, in stages of heuristic knowledge:
+        # the first children get most visits with progressive widening, so blocks of open threes come right after our fours
+        if node.untried_moves is None:
+            node.untried_moves = self.evaluator.generate_staged_moves(self.get_board(), block_threes = True)
+
+        # take the next move which hasn't been visited
+        move, score = next(node.untried_moves, (None, None))
+        if move is None:
+            node.is_fully_expanded = True    # the node is fully expanded
+            return None
+
+        # generate a new node with this move
+        self.make_move(move)
+        child = Node(move, self.turn, self.get_board().is_terminal, node)
+        node.children[move] = child
+
+        # get the selected child node
+        return child
+
+    def simulate_node(self, node) -> tuple:
+
+        '''
+        Return the total results ([draws, AI wins, opponent wins]) and the number of playouts simulated from the given node on the scratch board.
+        '''
+        results = [0, 0, 0]
+        results[self.simulation(self.get_board())] += 1
+        return results, 1
+
+    def simulation(self, board) -> int:
+
+        '''
+        Return the winner of simulation which uses the simple policy: 0: draw, 1: AI, 2: opponent.
+        '''
+        played_moves = self.playout_moves if self.use_rave else None
+        return self.playout_engine.run(board, played_moves)
+
+    def backpropogation(self, node, results: list, playouts: int = 1):
+
+        '''
+        Backpropogate to the root node to update the state of each node on the path.
+        Each node counts the wins of the player who moved into it, the player choosing it in self.get_best_child().
+        '''
+        while node is not None:    # the parent of the root is None
+            node.visit_times += playouts
+            node.win_times += results[3 - node.turn]    # wins of the player who moved last (total of all playouts), lost or draw count 0
+            node = node.parent    # backpropogation
+
+    def solve(self, node):
+
+        '''
+        Propagate the proven winner of the given node to its ancestors (MCTS-Solver).
+        A node is won by its turn if one child is, and won by the opponent if all its moves are.
+        '''
+        while node.parent is not None and not node.parent.proven:
+            parent = node.parent
+            if node.proven == parent.turn:    # a winning move for the player to move
+                parent.proven = parent.turn
+            elif parent.is_fully_expanded and all(child.proven == 3 - parent.turn for child in parent.children.values()):
+                parent.proven = 3 - parent.turn    # every move loses
+            else:
+                break
+            node = parent
+
+    def update_amaf(self, node, results: list, playouts: int = 1):
+
+        '''
+        Update the RAVE statistics of each node on the path with all moves played later by its turn (all moves as first).
+        Must be called before the moves of the path are taken back from the scratch board.
+        '''
+
+        # moves of the sample: moves on the path from the root, then moves of the playout
+        turn = self.root.turn
+        played_moves = []
+        for move in self.moves: played_moves.append((move, turn)); turn = 3 - turn
+        played_moves.extend(self.playout_moves)
+
+        # the node at depth i is in the position after the first i moves
+        depth = len(self.moves)
+        while node is not None:
+            if node.amaf is None: node.amaf = {}
+            for move, turn in played_moves[depth:]:
+                if turn != node.turn: continue    # only moves of the player to move at the node
+                if move not in node.amaf: node.amaf[move] = [0, 0]
+                node.amaf[move][0] += playouts
+                node.amaf[move][1] += results[turn]    # wins of the player of the move (total of all playouts)
+            node = node.parent
+            depth -= 1
+
+    def get_best_child(self, node):
+
+        '''
+        Return the best child with maximum UCT of the given node for the player to move at the node.
+        '''
+
+        # traverse all chidren of the node
+        best_value = -float('inf'); best_children = []
+        for child in node.children.values():
+
+            # skip proven children: the result is known without more playouts
+            if child.proven: continue
+
+            # compute the value of UCT
+            exploitation = child.win_times / child.visit_times    # exploitation: chance of winning for the player to move at the node
+            if node.amaf is not None and child.move in node.amaf:    # RAVE: weight of all-moves-as-first decays with visits
+                amaf_visit_times, amaf_win_times = node.amaf[child.move]
+                beta = math.sqrt(self.rave_equivalence / (3 * child.visit_times + self.rave_equivalence))
+                exploitation = (1 - beta) * exploitation + beta * amaf_win_times / amaf_visit_times
+            exploration = math.sqrt(math.log(node.visit_times) / child.visit_times)    # exploration: search more nodes
+            value = exploitation + self.confidence_level * exploration    # UCT: Upper Confidence Bound applied to Trees
+
+            # record the children with maximum UCT
+            if value > best_value: best_value = value; best_children = [child]    # only one child with maximum value
+            elif value == best_value: best_children.append(child)    # more than one child with maximum value
+
+        # choose one of the best children
+        return random.choice(best_children)
+
+    def get_best_move(self, node) -> tuple:
+
+        '''
+        Return the best move of the given node: the most visited child, the UCT exploration is only for the search.
+        '''
+
+        # a proven winning move
+        for move, child in node.children.items():
+            if child.proven == node.turn: return move
+
+        # get the move between the node and its most visited child, avoiding proven losing moves
+        best_child = max(node.children.values(), key = lambda x: (x.proven != 3 - node.turn, x.visit_times, x.win_times))
+        return best_child.move
+
+
+class Array_MCTS(MCTS):
+
+    def __init__(self, sample_size: int):
+
+        super().__init__(sample_size)
+        self.tree = None    # an instance of class Array_Tree
+
+    def advance(self, move: tuple):
+
+        '''
+        Drop the tree: the array tree is rebuilt by every search.
+        '''
+        self.reset()
+
+    def reset(self):
+
+        '''
+        Drop the Monte Carlo Tree.
+        '''
+        super().reset()
+        self.tree = None
+
+    def search(self, board, time_manager = None) -> tuple:
+
+        '''
+        Use MCTS on an array tree to search the best move for the given board.
+        Positions of nodes are rebuilt by making the moves on the path from the root on a scratch board.
+        '''
+
+        # scratch board: a copy of the given board
+        self.set_board(board)
+
+        # construct the root of Monte Carlo Tree
+        self.tree = Array_Tree(self.evaluator.WIDTH)
+        self.tree.add_node(-1, -1)
+        self.tree.is_leaf[0] = board.is_terminal
+        self.root = Tree_Node(self.tree, 0)
+
+        # play the game for sample_size times or until the time is up
+        samples = 0
+        while not self.is_finished(samples, time_manager):
+
+            # First Step: Selection & Second Step: Expansion
+            index = self.selection(0)    # select the node with higher possibility
+
+            # Third Step: Simulation
+            winner = self.simulation(self.get_board())    # only need the winner: 0: draw, 1: AI, 2: opponent
+
+            # Fourth step: Backpropagation
+            self.backpropogation(index, winner)    # update each node on the path
+            self.unmake_moves()
+            samples += 1
+
+        # get the best move from the root node
+        return self.get_best_move(self.root)
+
+    def selection(self, index: int) -> int:
+
+        '''
+        Return the index of the node selected by MCTS policy, with its position on the scratch board.
+        '''
+        tree = self.tree
+        while not tree.is_leaf[index]:
+
+            # reserve children for the staged moves of the evaluator when the node is visited for the first time
+            if tree.first_child[index] < 0:
+                tree.reserve_children(index, [move for move, score in self.evaluator.generate_staged_moves(self.get_board(), block_threes = True)])
+
+            # search in breadth: expand the next reserved child, at most as many children as progressive widening allows
+            if tree.child_count[index] < min(tree.child_total[index], self.get_widening_limit(Tree_Node(tree, index))):
+                child = tree.first_child[index] + tree.child_count[index]
+                tree.child_count[index] += 1
+                move = tree.get_move(child)
+                self.make_move(move)
+                board = self.get_board()
+                tree.is_leaf[child] = board.is_terminal
+                return child
+
+            # search in depth
+            index = self.get_best_child_index(index)
+            self.make_move(tree.get_move(index))
+
+        return index    # get the leaf node
+
+    def backpropogation(self, index: int, winner: int):
+
+        '''
+        Backpropogate to the root node to update the state of each node on the path.
+        Each node counts the wins of the player who moved into it: the scratch board must still be in the position of the node.
+        '''
+        tree = self.tree
+        turn = 3 - self.turn    # the player who moved into the node
+        while index >= 0:    # the parent of the root is -1
+            tree.visit_times[index] += 1
+            tree.win_times[index] += winner == turn    # 1: win, 0: lost or draw
+            index = tree.parent[index]    # backpropogation
+            turn = 3 - turn
+
+    def get_best_child_index(self, index: int) -> int:
+
+        '''
+        Return the index of the best child with maximum UCT of the given node, computed for all children at once.
+        '''
+        tree = self.tree
+        first, count = tree.first_child[index], tree.child_count[index]
+        log_visit_times = math.log(tree.visit_times[index])
+
+        # vectorized UCT with numpy
+        if numpy is not None:
+            visit_times = numpy.frombuffer(tree.visit_times, dtype = numpy.dtype(tree.visit_times.typecode))[first:first + count]
+            win_times = numpy.frombuffer(tree.win_times, dtype = numpy.dtype(tree.win_times.typecode))[first:first + count]
+            values = win_times / visit_times + self.confidence_level * numpy.sqrt(log_visit_times / visit_times)
+            best_children = numpy.flatnonzero(values == values.max()).tolist()
+            del visit_times, win_times    # release the buffers before they grow
+
+        # UCT over the slices of all children
+        else:
+            values = [
+                win_times / visit_times + self.confidence_level * math.sqrt(log_visit_times / visit_times)
+                for win_times, visit_times in zip(tree.win_times[first:first + count], tree.visit_times[first:first + count])
+            ]
+            best_value = max(values)
+            best_children = [i for i, value in enumerate(values) if value == best_value]
+
+        # choose one of the best children
+        return first + random.choice(best_children)
+
+    def get_best_move(self, node) -> tuple:
+
+        '''
+        Return the best move of the given node: the most visited child, the UCT exploration is only for the search.
+        '''
+        tree = self.tree
+        first, count = tree.first_child[node.index], tree.child_count[node.index]
+        best_child = max(range(first, first + count), key = lambda x: (tree.visit_times[x], tree.win_times[x]))
+        return tree.get_move(best_child)
+
+
+def run_mcts_worker(grid: list, turn: int, height: int, width: int, sample_size: int, budget: float, seed: int) -> dict:
+
+    '''
+    Run an independent MCTS in a worker process and return the statistics of root children: {(x, y): (visit times, win times)}.
+    '''
+    pp.height, pp.width = height, width    # the board size is not set in spawned processes
+    random.seed(seed)
+    searcher = MCTS(sample_size = sample_size)
+    time_manager = Time_Manager(budget = budget) if budget is not None else None
+    searcher.search(Board(grid = grid, turn = turn, candidates = Candidates(height, width, grid)), time_manager = time_manager)
+    return {move: (child.visit_times, child.win_times) for move, child in searcher.root.children.items()}
+
+
+def run_simulation_worker(grid: list, turn: int, move: tuple, height: int, width: int, seed: int) -> int:
+
+    '''
+    Run one playout from the given board in a worker process and return its winner: 0: draw, 1: AI, 2: opponent.
+    '''
+    pp.height, pp.width = height, width    # the board size is not set in spawned processes
+    random.seed(seed)
+    searcher = MCTS(sample_size = 1)
+    return searcher.simulation(Board(grid = grid, turn = turn, move = move, candidates = Candidates(height, width, grid)))
+
+
+class Parallel_MCTS(MCTS):
+
+    def __init__(self, sample_size: int, workers: int = None):
+
+        super().__init__(sample_size)
+        self.workers = workers or os.cpu_count() or 1    # number of worker processes
+        self.pool = None    # pool of worker processes, started by the first search and kept between turns
+
+    def get_pool(self):
+
+        '''
+        Return the pool of worker processes, started only once.
+        '''
+        if self.pool is None: self.pool = multiprocessing.Pool(processes = self.workers)
+        return self.pool
+
+    def close(self):
+
+        '''
+        Stop the worker processes.
+        '''
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+
+class Root_Parallel_MCTS(Parallel_MCTS):
+
+    def search(self, board, time_manager = None) -> tuple:
+
+        '''
+        Run independent MCTS from the given board in all workers and merge the statistics of root children.
+        Each worker gets a different random seed and a share of sample_size, or the time left with a time manager.
+        '''
+
+        # run searches in workers
+        grid = [row[:self.evaluator.WIDTH] for row in board.grid[:self.evaluator.HEIGHT]]
+        budget = max(0, time_manager.deadline - time.time()) if time_manager is not None else None
+        samples = -(-self.sample_size // self.workers)    # share of samples: ceil(sample_size / workers)
+        tasks = [
+            (grid, board.turn, self.evaluator.HEIGHT, self.evaluator.WIDTH, samples, budget, random.getrandbits(32))
+            for i in range(self.workers)
+        ]
+        results = self.get_pool().starmap(run_mcts_worker, tasks)
+
+        # merge the statistics into a new root
+        self.set_board(board)
+        self.root = Node(None, board.turn, board.is_terminal, None)
+        for result in results:
+            for move, (visit_times, win_times) in result.items():
+                if move not in self.root.children:
+                    self.make_move(move)
+                    self.root.children[move] = Node(move, self.turn, self.get_board().is_terminal, self.root)
+                    self.unmake_moves()
+                child = self.root.children[move]
+                child.visit_times += visit_times
+                child.win_times += win_times
+                self.root.visit_times += visit_times
+        self.root.is_fully_expanded = True
+
+        # get the best move from the merged root node
+        return self.get_best_move(self.root)
+
+
+class Leaf_Parallel_MCTS(Parallel_MCTS):
+
+    def __init__(self, sample_size: int, workers: int = None, batch_size: int = None):
+
+        super().__init__(sample_size, workers)
+        self.batch_size = batch_size or self.workers    # number of playouts from each selected leaf
+
+    def simulate_node(self, node) -> tuple:
+
+        '''
+        Return the total results ([draws, AI wins, opponent wins]) and the number of playouts simulated from the given node in a batch on the workers.
+        '''
+
+        # terminal board: every playout has the same result
+        board = self.get_board()    # the scratch board in the position of the node
+        results = [0, 0, 0]
+        if node.is_leaf:
+            results[self.simulation(board)] += self.batch_size
+            return results, self.batch_size
+
+        # run a batch of playouts in workers
+        grid = [row[:] for row in board.grid]
+        tasks = [
+            (grid, board.turn, board.move, self.evaluator.HEIGHT, self.evaluator.WIDTH, random.getrandbits(32))
+            for i in range(self.batch_size)
+        ]
+        for winner in self.get_pool().starmap(run_simulation_worker, tasks): results[winner] += 1
+        return results, self.batch_size
 
 
 ### functions in pisqpipe module
@@ -1275,12 +3459,15 @@ def brain_init():
 	if pp.width > MAX_BOARD or pp.height > MAX_BOARD:
 		pp.pipeOut('ERROR Maximal board size is {}'.format(MAX_BOARD))
 		return
+	Evaluator().load_pattern_table()    # build or load the pattern table before the first turn
 	pp.pipeOut('OK')
 
 def brain_restart():
 	for x in range(pp.height):
 		for y in range(pp.width):
 			board[x][y] = 0
+	if isinstance(searcher, MCTS):
+		searcher.reset()
 	pp.pipeOut('OK')
 
 def isFree(x, y):
@@ -1289,42 +3476,89 @@ def isFree(x, y):
 def brain_my(x, y):
 	if isFree(x, y):
 		board[x][y] = 1
+		if isinstance(searcher, MCTS):
+			searcher.advance((x, y))
 	else:
 		pp.pipeOut('ERROR my move [{},{}]'.format(x, y))
 
 def brain_opponents(x, y):
 	if isFree(x, y):
 		board[x][y] = 2
+		if isinstance(searcher, MCTS):
+			searcher.advance((x, y))
 	else:
 		pp.pipeOut("ERROR opponents's move [{},{}]".format(x, y))
 
 def brain_block(x, y):
 	if isFree(x,y):
 		board[x][y] = 3
+		if isinstance(searcher, MCTS):
+			searcher.reset()
 	else:
 		pp.pipeOut('ERROR winning move [{},{}]'.format(x, y))
 
 def brain_takeback(x, y):
 	if 0 <= x < pp.height and 0 <= y < pp.width and board[x][y] != 0:
 		board[x][y] = 0
+		if isinstance(searcher, MCTS):
+			searcher.reset()
 		return 0
 	return 2
 
 def brain_turn():
+    global searcher
     if pp.terminateAI:
         return
+    time_manager = Time_Manager(sum(1 for x in range(pp.height) for y in range(pp.width) if board[x][y] != 0))
+
+    # search for a forced victory first, for us and against the opponent (only a confirmed refutation is played)
+    forced_move = Threat_Space_Search().get_best_move(board = board, turn = 1, time_manager = time_manager)
+    if forced_move is not None:
+        pp.do_mymove(*forced_move)
+        return
+
+    # prove a win with df-pn first (late-game positions, slower than the threat-space search)
+    # result, proof_move, nodes, seconds = Proof_Number_Search(max_nodes = 20000).solve(Board(grid = board, turn = 1), time_manager = time_manager)
+    # if result == 1:
+    #     pp.do_mymove(*proof_move)
+    #     return
+
     i = 0
     while True:
 
         ################## API for searching best move ##################
         
-        ### use Minimax with Alpha-Beta Pruning
+        ### use Minimax with Alpha-Beta Pruning on the best forced move of the heuristic knowledge (a single line)
         # searcher = Minimax_with_Alpha_Beta_Pruning()
         # x, y = searcher.get_best_move(board = board, depth = 2)
 
-        ### use MCTS
-        searcher = MCTS(sample_size = 1000)
-        x, y = searcher.search(Board(grid = board, turn = 1))
+        ### use Minimax over all surrounding moves (ordered by PV, killer moves and history) by iterative deepening within the time budget
+        # searcher = Minimax_with_Alpha_Beta_Pruning(use_heuristic = False)
+        # x, y = searcher.get_best_move(board = board, depth = 10, time_manager = time_manager)
+
+        ### use MCTS within the time budget (the tree is kept between turns)
+        if not isinstance(searcher, MCTS): searcher = MCTS(sample_size = 1000)
+        x, y = searcher.search(Board(grid = board, turn = 1, candidates = Candidates(pp.height, pp.width, board)), time_manager = time_manager)
+
+        ### use MCTS with truncated light playouts within the time budget
+        # if not isinstance(searcher, MCTS): searcher = MCTS(sample_size = 1000); searcher.playout_engine = Playout_Engine(policy = 'light', max_depth = 20)
+        # x, y = searcher.search(Board(grid = board, turn = 1, candidates = Candidates(pp.height, pp.width, board)), time_manager = time_manager)
+
+        ### use MCTS with RAVE statistics within the time budget
+        # if not isinstance(searcher, MCTS): searcher = MCTS(sample_size = 1000, use_rave = True)
+        # x, y = searcher.search(Board(grid = board, turn = 1, candidates = Candidates(pp.height, pp.width, board)), time_manager = time_manager)
+
+        ### use MCTS on a compact array tree within the time budget
+        # if not isinstance(searcher, Array_MCTS): searcher = Array_MCTS(sample_size = 1000)
+        # x, y = searcher.search(Board(grid = board, turn = 1), time_manager = time_manager)
+
+        ### use root-parallel MCTS in worker processes within the time budget (the workers are kept between turns)
+        # if not isinstance(searcher, Root_Parallel_MCTS): searcher = Root_Parallel_MCTS(sample_size = 1000, workers = os.cpu_count())
+        # x, y = searcher.search(Board(grid = board, turn = 1), time_manager = time_manager)
+
+        ### use leaf-parallel MCTS: batches of playouts in worker processes within the time budget
+        # if not isinstance(searcher, Leaf_Parallel_MCTS): searcher = Leaf_Parallel_MCTS(sample_size = 1000, workers = os.cpu_count(), batch_size = os.cpu_count())
+        # x, y = searcher.search(Board(grid = board, turn = 1, candidates = Candidates(pp.height, pp.width, board)), time_manager = time_manager)
 
         ### use heuristic knowledge only
         # evaluator = Evaluator()
@@ -1342,7 +3576,8 @@ def brain_turn():
     pp.do_mymove(x, y)
 
 def brain_end():
-	pass
+	if isinstance(searcher, Parallel_MCTS):
+		searcher.close()
 
 def brain_about():
 	pp.pipeOut(pp.infotext)
@@ -1374,6 +3609,7 @@ if DEBUG_EVAL:
 
 ### main
 def main():
+	multiprocessing.freeze_support()    # worker processes of a frozen executable
 	pp.main()
 
 if __name__ == '__main__':